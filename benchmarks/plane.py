@@ -0,0 +1,147 @@
+"""Benchmark of the plane strain and stress templates against their 3D variants.
+
+Prints the number of instructions of the generated casADi functions and the times
+of the generation and of the evaluation of the function, gradient and hessian on
+``N`` points for the plane (2D) and the 3D variants of the templates.
+
+    python benchmarks/plane.py
+    python benchmarks/plane.py --points 100000 --threads 1 --models neo_hooke
+"""
+
+import argparse
+import json
+from time import perf_counter
+
+from run import inputs, library
+
+import matadi.models as md
+from matadi import (
+    MaterialHyperelastic,
+    MaterialHyperelasticPlaneStrain,
+    MaterialHyperelasticPlaneStressIncompressible,
+    ThreeFieldVariation,
+    ThreeFieldVariationPlaneStrain,
+    TwoFieldVariation,
+    TwoFieldVariationPlaneStrain,
+)
+
+MODELS = {
+    "neo_hooke": md.neo_hooke,
+    "mooney_rivlin": md.mooney_rivlin,
+    "yeoh": md.yeoh,
+    "ogden": md.ogden,
+    "arruda_boyce": md.arruda_boyce,
+    "extended_tube": md.extended_tube,
+}
+
+
+def templates(model, kwargs):
+    "Return a dict with the 2D and 3D constructors of all templates."
+
+    def hyperelastic(plane):
+        if plane:
+            return MaterialHyperelasticPlaneStrain(model, **kwargs)
+        return MaterialHyperelastic(model, **kwargs)
+
+    return {
+        "MaterialHyperelastic": (
+            lambda: hyperelastic(True),
+            lambda: hyperelastic(False),
+        ),
+        "PlaneStressIncompressible": (
+            lambda: MaterialHyperelasticPlaneStressIncompressible(model, **kwargs),
+            lambda: hyperelastic(False),
+        ),
+        "TwoFieldVariation": (
+            lambda: TwoFieldVariationPlaneStrain(hyperelastic(True)),
+            lambda: TwoFieldVariation(hyperelastic(False)),
+        ),
+        "ThreeFieldVariation": (
+            lambda: ThreeFieldVariationPlaneStrain(hyperelastic(True)),
+            lambda: ThreeFieldVariation(hyperelastic(False)),
+        ),
+    }
+
+
+def run(models, points, threads, repeat):
+    "Run the benchmark cases and return a list of results."
+
+    lib = library()
+    results = []
+
+    for name in models:
+        model = MODELS[name]
+
+        for template, variants in templates(model, lib[model]).items():
+            for dim, constructor in zip(["2D", "3D"], variants):
+                start = perf_counter()
+                material = constructor()
+                functions = {
+                    method: getattr(material.W, attr)
+                    for method, attr in [
+                        ("function", "_function"),
+                        ("gradient", "_gradient"),
+                        ("hessian", "_hessian"),
+                    ]
+                }
+                generation = perf_counter() - start
+
+                record = {
+                    "model": name,
+                    "template": template,
+                    "dim": dim,
+                    "generation": generation,
+                    "instructions": {
+                        method: fun.n_instructions()
+                        for method, fun in functions.items()
+                    },
+                }
+
+                x = inputs(material, points)
+
+                for method in ["function", "gradient", "hessian"]:
+                    times = []
+
+                    for r in range(repeat):
+                        start = perf_counter()
+                        getattr(material, method)(x, threads=threads)
+                        times.append(perf_counter() - start)
+
+                    record[method] = min(times)
+
+                results.append(record)
+
+                print(
+                    f"{name:16s} {template:26s} {dim} "
+                    f"generation={generation:.3f} s "
+                    + " ".join(
+                        f"{method}={record[method]:.3e} s "
+                        f"({record['instructions'][method]} instructions)"
+                        for method in ["function", "gradient", "hessian"]
+                    ),
+                    flush=True,
+                )
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--models", nargs="+", default=list(MODELS), help="names of models"
+    )
+    parser.add_argument("--points", type=int, default=10**5, help="number of points")
+    parser.add_argument("--threads", type=int, default=1, help="number of threads")
+    parser.add_argument("--repeat", type=int, default=3, help="number of repetitions")
+    parser.add_argument("--output", default=None, help="JSON file")
+    args = parser.parse_args(argv)
+
+    results = run(args.models, args.points, args.threads, args.repeat)
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+"""Benchmark suite of matADi.
+
+Times the construction and the evaluation methods of all models of `matadi.models`
+and of all material templates on ``N`` points (from 1 up to 10^7) and for given
+numbers of threads. The results are saved as JSON file, which may be compared with
+the results of another version of matADi or casADi.
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --points 1 1000 100000 --threads 1 4 --cases neo_hooke
+    python benchmarks/run.py --compare old.json new.json
+"""
+
+import argparse
+import inspect
+import json
+import platform
+import sys
+from multiprocessing import cpu_count
+from time import perf_counter
+
+import casadi as ca
+import numpy as np
+
+import matadi
+import matadi.models as md
+from matadi import (
+    MaterialComposite,
+    MaterialHyperelastic,
+    MaterialHyperelasticPlaneStrain,
+    MaterialHyperelasticPlaneStressIncompressible,
+    MaterialHyperelasticPlaneStressLinearElastic,
+    MaterialTensor,
+    ThreeFieldVariation,
+    ThreeFieldVariationPlaneStrain,
+    TwoFieldVariation,
+    TwoFieldVariationPlaneStrain,
+)
+
+
+def library():
+    "Library with hyperelastic models and parameters."
+
+    q = md.microsphere.quadrature.BazantOh(n=21)
+
+    return {
+        md.saint_venant_kirchhoff: {"mu": 1.0, "lmbda": 20.0},
+        md.neo_hooke: {"C10": 0.5, "bulk": 5000.0},
+        md.mooney_rivlin: {"C10": 0.3, "C01": 0.8, "bulk": 5000.0},
+        md.yeoh: {"C10": 0.5, "C20": 0.1, "C30": 0.01, "bulk": 5000.0},
+        md.third_order_deformation: {
+            "C10": 0.3,
+            "C01": 0.2,
+            "C11": 0.02,
+            "C20": -0.1,
+            "C30": 0.02,
+            "bulk": 5000.0,
+        },
+        md.ogden: {"mu": (1.0, 0.2), "alpha": (2.0, -1.5), "bulk": 5000.0},
+        md.arruda_boyce: {"C1": 1.0, "limit": 3.2, "bulk": 5000.0},
+        md.extended_tube: {
+            "Gc": 0.1867,
+            "Ge": 0.2169,
+            "beta": 0.2,
+            "delta": 0.09693,
+            "bulk": 5000.0,
+        },
+        md.van_der_waals: {
+            "mu": 1.0,
+            "beta": 0.1,
+            "a": 0.5,
+            "limit": 5.0,
+            "bulk": 5000.0,
+        },
+        md.linear_elastic: {"mu": 1.0, "lmbda": 2.0},
+        md.fiber: {"E": 1.0, "angle": 30, "axis": 2, "bulk": 5000.0},
+        md.fiber_family: {"E": 1.0, "angle": 30, "axis": 2, "bulk": 5000.0},
+        md.holzapfel_gasser_ogden: {
+            "c": 0.0764,
+            "k1": 996.6,
+            "k2": 524.6,
+            "kappa": 0.2,
+            "angle": 49.98,
+            "axis": 2,
+            "bulk": 5000.0,
+        },
+        md.microsphere.affine.stretch: {
+            "quadrature": q,
+            "f": md.microsphere.langevin,
+            "kwargs": {"mu": 1, "N": 10},
+            "bulk": 5000.0,
+        },
+        md.microsphere.affine.tube: {
+            "quadrature": q,
+            "f": md.microsphere.langevin2,
+            "kwargs": {"mu": 1, "N": 10},
+            "bulk": 5000.0,
+        },
+        md.microsphere.nonaffine.stretch: {
+            "quadrature": q,
+            "p": 2.7,
+            "f": md.microsphere.gauss,
+            "kwargs": {"mu": 1},
+            "bulk": 5000.0,
+        },
+        md.microsphere.nonaffine.tube: {
+            "quadrature": q,
+            "q": 2.7,
+            "f": md.microsphere.linear,
+            "kwargs": {"mu": 1},
+            "bulk": 5000.0,
+        },
+        md.miehe_goektepe_lulei: {
+            "mu": 0.1475,
+            "N": 3.273,
+            "p": 9.31,
+            "U": 9.94,
+            "q": 0.567,
+            "bulk": 5000.0,
+        },
+    }
+
+
+def cases():
+    "Return a dict with the names and constructors of all benchmark cases."
+
+    lib = library()
+    nh = (md.neo_hooke, lib[md.neo_hooke])
+    mr = (md.mooney_rivlin, lib[md.mooney_rivlin])
+    le = (md.linear_elastic, lib[md.linear_elastic])
+
+    def name(model):
+        return model.__module__.split(".")[-1].strip("_") + "." + model.__name__
+
+    def composite(fused=False):
+        materials = [
+            MaterialHyperelastic(nh[0], **nh[1]),
+            MaterialHyperelastic(mr[0], **mr[1]),
+        ]
+
+        # older versions of matADi don't support fused composites
+        if not fused:
+            return MaterialComposite(materials)
+
+        if "fused" not in inspect.signature(MaterialComposite).parameters:
+            raise NotImplementedError("MaterialComposite(fused=True)")
+
+        return MaterialComposite(materials, fused=fused)
+
+    catalog = {
+        name(model): (lambda m=model, k=kwargs: MaterialHyperelastic(m, **k))
+        for model, kwargs in lib.items()
+    }
+
+    catalog.update(
+        {
+            "NeoHookeOgdenRoxburgh": md.NeoHookeOgdenRoxburgh,
+            "Morph": md.Morph,
+            "Viscoelastic": md.Viscoelastic,
+            "ViscoelasticMooneyRivlin": md.ViscoelasticMooneyRivlin,
+            "MaterialHyperelasticPlaneStrain": lambda: MaterialHyperelasticPlaneStrain(
+                nh[0], **nh[1]
+            ),
+            "MaterialHyperelasticPlaneStressIncompressible": lambda: (
+                MaterialHyperelasticPlaneStressIncompressible(nh[0], C10=0.5)
+            ),
+            "MaterialHyperelasticPlaneStressLinearElastic": lambda: (
+                MaterialHyperelasticPlaneStressLinearElastic(le[0], **le[1])
+            ),
+            "TwoFieldVariation": lambda: TwoFieldVariation(
+                MaterialHyperelastic(nh[0], **nh[1])
+            ),
+            "TwoFieldVariationPlaneStrain": lambda: TwoFieldVariationPlaneStrain(
+                MaterialHyperelasticPlaneStrain(nh[0], **nh[1])
+            ),
+            "ThreeFieldVariation": lambda: ThreeFieldVariation(
+                MaterialHyperelastic(nh[0], **nh[1])
+            ),
+            "ThreeFieldVariationPlaneStrain": lambda: ThreeFieldVariationPlaneStrain(
+                MaterialHyperelasticPlaneStrain(nh[0], **nh[1])
+            ),
+            "MaterialComposite": composite,
+            "MaterialCompositeFused": lambda: composite(fused=True),
+        }
+    )
+
+    return catalog
+
+
+def variables(material):
+    "Return the list of variables of a material."
+    try:
+        return material.x
+    except AttributeError:
+        return material.materials[0].x
+
+
+def inputs(material, N, seed=0):
+    """Return a list of Fortran-contiguous input arrays on `N` points. The first
+    variable is a deformation gradient, all other variables are close to one."""
+
+    rng = np.random.default_rng(seed)
+    x = []
+
+    for a, y in enumerate(variables(material)):
+        z = 1 + rng.random((*y.shape, N)) / 100
+
+        if a == 0:
+            z = (rng.random((*y.shape, N)) - 0.5) / 10
+            z += np.eye(y.shape[0])[..., None]
+
+        x.append(np.asfortranarray(z))
+
+    return x
+
+
+def methods(material):
+    "Return a dict with the evaluation methods of a material and their arguments."
+
+    def scalar(x, v):
+        return {
+            "function": (x,),
+            "gradient": (x,),
+            "hessian": (x,),
+            "gradient_vector_product": (x, v),
+            "hessian_vector_product": (x, v, v),
+        }
+
+    def tensor(x, v):
+        return {
+            "function": (x,),
+            "gradient": (x,),
+            "hessian": (x,),
+            "gradient_vector_product": ([*x, *v],),
+        }
+
+    if isinstance(material, MaterialTensor):
+        return tensor
+    elif isinstance(material, MaterialComposite) and not getattr(
+        material, "fused", False
+    ):
+        return lambda x, v: {
+            key: value
+            for key, value in scalar(x, v).items()
+            if key in ["function", "gradient", "hessian"]
+        }
+    else:
+        return scalar
+
+
+def nbytes(results):
+    "Return the number of bytes of a list of results."
+    return sum(r.nbytes for r in results if r is not None)
+
+
+def failed(record, error):
+    "Mark a record as skipped because of an error and print the error."
+    record.update({"skipped": "error", "error": f"{type(error).__name__}: {error}"})
+    print(f"{record['case']:48s} {record.get('method', ''):24s} {record['error']}")
+    return record
+
+
+def run(names, points, threads, repeat, memory, save=None):
+    """Run the benchmark cases and return a list of results. A failing case is
+    recorded as skipped and the results are passed to `save` after each method."""
+
+    catalog = cases()
+    results = []
+
+    for name in names:
+        try:
+            start = perf_counter()
+            material = catalog[name]()
+            construction = perf_counter() - start
+
+            arguments = methods(material)
+            x = inputs(material, 1)
+            evaluations = arguments(x, x)
+
+        except NotImplementedError as error:
+            print(f"{name:48s} {'':24s} unsupported: {error}")
+            results.append({"case": name, "skipped": "unsupported"})
+            continue
+
+        except Exception as error:
+            results.append(failed({"case": name}, error))
+            continue
+
+        for method, args in evaluations.items():
+            # first evaluation on one point, which also generates the derivatives
+            try:
+                start = perf_counter()
+                res = getattr(material, method)(*args, threads=1)
+                first = perf_counter() - start
+
+            except Exception as error:
+                results.append(failed({"case": name, "method": method}, error))
+                continue
+
+            bytes_per_point = 8 * sum(y.size for y in x) + nbytes(res)
+
+            for N in points:
+                for t in threads:
+                    record = {
+                        "case": name,
+                        "method": method,
+                        "points": N,
+                        "threads": t,
+                        "construction": construction,
+                        "first": first,
+                    }
+
+                    if bytes_per_point * N > memory:
+                        record["skipped"] = "memory"
+                        results.append(record)
+                        continue
+
+                    y = inputs(material, N)
+                    args = arguments(y, y)[method]
+                    times = []
+
+                    try:
+                        for r in range(repeat):
+                            start = perf_counter()
+                            res = getattr(material, method)(*args, threads=t)
+                            times.append(perf_counter() - start)
+
+                    except Exception as error:
+                        results.append(failed(record, error))
+                        continue
+
+                    record.update(
+                        {
+                            "seconds": min(times),
+                            "mean": float(np.mean(times)),
+                            "points_per_second": N / min(times),
+                            "bytes": nbytes(res),
+                        }
+                    )
+                    results.append(record)
+                    del res
+
+                    print(
+                        f"{name:48s} {method:24s} N={N:<9d} threads={t:<3d} "
+                        f"{min(times):.3e} s",
+                        flush=True,
+                    )
+
+            if save is not None:
+                save(results)
+
+    return results
+
+
+def compare(old, new):
+    "Print the ratios of the evaluation times of two JSON files of results."
+
+    def load(path):
+        with open(path) as f:
+            data = json.load(f)
+
+        return data, {
+            (r["case"], r["method"], r["points"], r["threads"]): r["seconds"]
+            for r in data["results"]
+            if "seconds" in r
+        }
+
+    (a, ta), (b, tb) = load(old), load(new)
+    print(f"old: matadi {a['matadi']}, casadi {a['casadi']}")
+    print(f"new: matadi {b['matadi']}, casadi {b['casadi']}")
+
+    for key in sorted(set(ta) & set(tb)):
+        print("{:48s} {:24s} N={:<9d} threads={:<3d}".format(*key), end=" ")
+        print(f"{tb[key] / ta[key]:6.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", nargs="+", default=None, help="names of cases")
+    parser.add_argument(
+        "--points",
+        nargs="+",
+        type=int,
+        default=[10**a for a in range(8)],
+        help="numbers of points",
+    )
+    parser.add_argument(
+        "--threads",
+        nargs="+",
+        type=int,
+        default=sorted({1, cpu_count()}),
+        help="numbers of threads",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="number of repetitions")
+    parser.add_argument(
+        "--memory",
+        type=float,
+        default=4e9,
+        help="maximum bytes of input and output arrays (larger cases are skipped)",
+    )
+    parser.add_argument("--output", default="benchmark.json", help="JSON file")
+    parser.add_argument("--list", action="store_true", help="list all cases")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(cases()))
+        return
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    def save(results):
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "matadi": matadi.__version__,
+                    "casadi": ca.__version__,
+                    "numpy": np.__version__,
+                    "python": sys.version.split()[0],
+                    "platform": platform.platform(),
+                    "cpu_count": cpu_count(),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+    names = args.cases if args.cases is not None else list(cases())
+    save(run(names, args.points, args.threads, args.repeat, args.memory, save))
+
+
+if __name__ == "__main__":
+    main()
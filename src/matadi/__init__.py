@@ -1,5 +1,8 @@
 from . import math, models
 from .__about__ import __version__
+from ._apply import Arena, CopyWarning, arena, get_memory_budget, set_memory_budget
+from ._autotune import Autotuner, autotuner
+from ._calibration import Calibration
 from ._lab_compressible import LabCompressible
 from ._lab_compressible import LabCompressible as Lab
 from ._lab_incompressible import LabIncompressible
@@ -9,6 +12,9 @@ from ._material import FunctionTensor
 from ._material import Material
 from ._material import Material as MaterialScalar
 from ._material import MaterialTensor
+from ._profile import Stats
+from ._regions import MaterialRegions
+from ._symmetric import PackedSymmetric
 from ._templates import (
     MaterialComposite,
     MaterialHyperelastic,
@@ -27,6 +33,14 @@ __all__ = [
     "__version__",
     "math",
     "models",
+    "Arena",
+    "arena",
+    "CopyWarning",
+    "get_memory_budget",
+    "set_memory_budget",
+    "Autotuner",
+    "autotuner",
+    "Calibration",
     "LabCompressible",
     "LabIncompressible",
     "Lab",
@@ -36,6 +50,9 @@ __all__ = [
     "Material",
     "MaterialScalar",
     "MaterialTensor",
+    "PackedSymmetric",
+    "Stats",
+    "MaterialRegions",
     "MaterialComposite",
     "MaterialHyperelastic",
     "MaterialHyperelasticPlaneStrain",
@@ -1,8 +1,244 @@
+from collections import OrderedDict, namedtuple
+from sys import getrefcount
+from threading import Lock
+from time import perf_counter
+from warnings import warn
+from weakref import WeakKeyDictionary
+
 import numpy as np
 
+from ._autotune import autotuner
+
+CacheInfo = namedtuple("CacheInfo", "hits misses maxsize currsize")
+
+
+class CopyWarning(ResourceWarning):
+    """Warning for input arrays which have to be copied before the evaluation
+    because their memory layout isn't Fortran-contiguous (ignored by default)."""
+
+
+class MapCache:
+    """A least-recently-used cache of mapped casADi functions, keyed by the number
+    of mapped evaluations, the number of threads and the parallelization."""
+
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._mapped = OrderedDict()
+        self._lock = Lock()
+
+    def __call__(self, fun, N, threads=1):
+        "Return the casADi function `fun`, mapped `N` times."
+
+        if threads > 1:
+            parallelization = "thread"
+        else:
+            parallelization = "serial"
+
+        key = (N, threads, parallelization)
+
+        with self._lock:
+            if key in self._mapped:
+                self.hits += 1
+                self._mapped.move_to_end(key)
+                return self._mapped[key]
+
+            self.misses += 1
+            mapped = self._mapped[key] = fun.map(N, parallelization, threads)
+
+            # evict the least-recently-used mapped function
+            if len(self._mapped) > self.maxsize:
+                self._mapped.popitem(last=False)
+
+        return mapped
+
+    def cache_info(self):
+        "Return hits, misses, maximum and current size of the cache."
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._mapped))
+
+    def cache_clear(self):
+        "Clear the cache and its statistics."
+        with self._lock:
+            self._mapped.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# caches of mapped functions for each casADi function
+_caches = WeakKeyDictionary()
+
+
+def mapcache(fun):
+    "Return the cache of mapped functions of the casADi function `fun`."
+    try:
+        return _caches[fun]
+    except KeyError:
+        return _caches.setdefault(fun, MapCache())
+
+
+class Arena:
+    """A pool of reusable output arrays, keyed by shape. A pooled array is only
+    handed out again if it is no longer referenced outside of the pool. The pool
+    holds at most `maxarrays` arrays for each of `maxsize` shapes and at most
+    `maxbytes` bytes in total (arrays of the least-recently-used shapes are released
+    first). With `maxbytes=0`, arrays are not pooled at all."""
+
+    def __init__(self, maxsize=16, maxarrays=4, maxbytes=2**30):
+        self.maxsize = maxsize
+        self.maxarrays = maxarrays
+        self.maxbytes = maxbytes
+        self._arrays = OrderedDict()
+        self._lock = Lock()
+
+        # reference count of a pooled array without any outside references
+        self._free = self._references([np.empty(0)])[0]
+
+    @staticmethod
+    def _references(arrays):
+        return [getrefcount(array) for array in arrays]
+
+    @property
+    def nbytes(self):
+        "Total bytes of all pooled arrays."
+        return sum(a.nbytes for arrays in self._arrays.values() for a in arrays)
+
+    def empty(self, shape):
+        """Return an uninitialized, Fortran-contiguous array of the given shape and
+        whether it was newly allocated (otherwise, a pooled array is reused)."""
+
+        with self._lock:
+            arrays = self._arrays.setdefault(shape, [])
+            self._arrays.move_to_end(shape)
+
+            for array, references in zip(arrays, self._references(arrays)):
+                if references <= self._free:
+                    return array, False
+
+            array = np.empty(shape, order="F")
+
+            if len(arrays) < self.maxarrays:
+                arrays.append(array)
+
+            # evict the arrays of the least-recently-used shapes
+            while len(self._arrays) > self.maxsize or (
+                self._arrays and self.nbytes > self.maxbytes
+            ):
+                self._arrays.popitem(last=False)
+
+        return array, True
+
+    def clear(self):
+        "Release all pooled arrays."
+        with self._lock:
+            self._arrays.clear()
+
+
+# pool of output arrays
+arena = Arena()
+
+
+# memory budget of the temporary arrays of a chunk of points in bytes
+_memory_budget = 256 * 1024**2
+
+
+def set_memory_budget(nbytes):
+    """Set the memory budget in bytes of the input and output arrays of a chunk of
+    points. Evaluations on more points are split into chunks of points."""
+    global _memory_budget
+    _memory_budget = int(nbytes)
+
+
+def get_memory_budget():
+    "Return the memory budget in bytes of a chunk of points."
+    return _memory_budget
+
+
+def evaluate(fun, N, args, res, threads=1, nonzeros=False):
+    """Evaluate the casADi function `fun`, mapped `N` times, on a list of flat input
+    arrays `args` and write the results (or only their structural nonzeros) into the
+    list of output arrays `res`. Returns the times of the construction of the mapped
+    function and of the evaluation in seconds."""
 
-def apply(x, fun, x_shape, fun_shape, threads=1):
-    "Helper function for the calculation of fun(x)."
+    start = perf_counter()
+    mapped = mapcache(fun)(fun, N, threads)
+    buffer, call = mapped.buffer()
+    construction = perf_counter() - start
+
+    for i, arg in enumerate(args):
+        buffer.set_arg(i, memoryview(arg))
+
+    flat = []
+
+    for i, r in enumerate(res):
+        if (nonzeros or fun.sparsity_out(i).is_dense()) and r.flags.f_contiguous:
+            # write the results directly into the output array
+            y = r.reshape(-1, order="F")
+            flat.append(None)
+        else:
+            y = np.empty(mapped.nnz_out(i))
+            flat.append(y)
+
+        buffer.set_res(i, memoryview(y))
+
+    start = perf_counter()
+    call()
+    evaluation = perf_counter() - start
+
+    # scatter the nonzeros into the output arrays
+    for i, (r, y) in enumerate(zip(res, flat)):
+        if y is not None and nonzeros:
+            r[...] = y.reshape(r.shape, order="F")
+
+        elif y is not None and r.flags.f_contiguous:
+            # in-place, without a dense temporary array
+            z = r.reshape(-1, N, order="F")
+            z.fill(0)
+            z[fun.sparsity_out(i).find()] = y.reshape(-1, N, order="F")
+
+        elif y is not None:
+            z = np.zeros((fun.numel_out(i), N), order="F")
+            z[fun.sparsity_out(i).find()] = y.reshape(-1, N, order="F")
+            r[...] = z.reshape(r.shape, order="F")
+
+    return construction, evaluation
+
+
+def sparsity(fun, fun_shape):
+    """Return the sparsity patterns of the outputs of the casADi function `fun` as
+    tuples of indices of the structural nonzeros in the output blocks of shape
+    `fun_shape`, i.e. `dense[index] = nonzeros`."""
+
+    index = [
+        np.array(fun.sparsity_out(i).find(), dtype=int) for i in range(fun.n_out())
+    ]
+
+    return [
+        np.unravel_index(a, shape, order="F") if shape else ()
+        for a, shape in zip(index, fun_shape)
+    ]
+
+
+def apply(
+    x,
+    fun,
+    x_shape,
+    fun_shape,
+    threads=1,
+    out=None,
+    chunksize=None,
+    nonzeros=False,
+    stats=None,
+    method=None,
+):
+    """Helper function for the calculation of fun(x). Optionally, only the structural
+    nonzeros of the outputs are returned as arrays of shape `(nnz, ...)`. With
+    `threads="auto"`, the number of threads and the chunksize are autotuned. The
+    evaluation is recorded as `method` in the profiling statistics `stats`."""
+
+    start = perf_counter()
+
+    x = [np.asarray(z) for z in x]
 
     # get shape of trailing axes
     trailing_axes = [len(y.shape) - len(y_shape) for y, y_shape in zip(x, x_shape)][0]
@@ -12,33 +248,126 @@ def apply(x, fun, x_shape, fun_shape, threads=1):
     else:
         ax = x[0].shape[-trailing_axes:]
 
-    def rshape(z):
-        "Reshape array `z`: 'i,j,...->i,...'."
-        if len(z.shape) == trailing_axes:
-            return z.reshape(1, -1, order="F")
-        else:
-            return z.reshape(z.shape[0], -1, order="F")
+    N = int(np.prod(ax))
 
-    # apply reshape on input
-    y = [rshape(z) for z in x]
+    # inputs with trailing axes of the points, all other inputs are repeated
+    points = x[0].shape[len(x[0].shape) - trailing_axes :]
+    pointwise = [
+        z.shape[max(0, len(z.shape) - trailing_axes) :] == points
+        and z.size == fun.nnz_in(i) * N
+        for i, z in enumerate(x)
+    ]
 
-    # threads dict
-    if threads > 1:
-        parallel = ("thread", threads)
-    else:
-        parallel = ()
+    for i, z in enumerate(x):
+        if pointwise[i] and N > 1 and not (z.flags.f_contiguous and z.dtype == float):
+            warn(
+                f"Input {i} of shape {z.shape} and dtype {z.dtype} is not a "
+                f"Fortran-contiguous float array and is copied ({8 * z.size} bytes).",
+                CopyWarning,
+                stacklevel=3,
+            )
+
+    def flatten(z, i, chunk, n):
+        """Flatten the chunk of array `z`: 'i,j,...->(i,j,...)'. This is a view for
+        Fortran-contiguous float arrays, otherwise a copy."""
+
+        if pointwise[i]:
+            if chunk is not None:
+                z = z[..., chunk]
+
+            return np.ascontiguousarray(np.reshape(z, -1, order="F"), dtype=float)
 
-    # map function `N` times on reshaped input
-    N = np.prod(ax)
-    out = fun.map(N, *parallel)(*y)
+        # repeat a single input for all mapped evaluations
+        if z.size == fun.nnz_in(i):
+            return np.tile(np.reshape(z, -1, order="F").astype(float), n)
 
-    if not isinstance(out, tuple):
-        out = (out,)
+        raise ValueError(
+            f"Input {i} of shape {z.shape} must have {fun.nnz_in(i)} items, either "
+            f"once or for each point of the trailing axes {points}."
+        )
 
-    # return 'i,j,...' reshaped output
+    # return 'i,j,...' shaped output
     if trailing_axes == 0:
         ax = ()
         if fun_shape == [()]:
             fun_shape = [(1,)]
 
-    return [np.array(o).reshape(*f, *ax, order="F") for o, f in zip(out, fun_shape)]
+    shapes = [(*f, *ax) for f in fun_shape][: fun.n_out()]
+
+    if nonzeros:
+        shapes = [(fun.nnz_out(i), *ax) for i in range(len(shapes))]
+
+    if out is None:
+        out = []
+
+    res = []
+    nbytes = 0
+
+    for i, (o, shape) in enumerate(zip([*out, *[None] * len(shapes)], shapes)):
+        if o is not None and (
+            o.shape != shape or o.dtype != float or not o.flags.writeable
+        ):
+            raise ValueError(
+                f"Output {i} must be a writeable float array of shape {shape}."
+            )
+
+        if o is None:
+            o, allocated = arena.empty(shape)
+
+            # only newly allocated output arrays are counted
+            if allocated:
+                nbytes += o.nbytes
+
+        res.append(o)
+
+    def run(threads, chunksize):
+        """Evaluate all chunks of points. Returns the wall time and the times of the
+        construction of mapped functions and of the evaluations in seconds."""
+
+        begin = perf_counter()
+        times = np.zeros(2)
+
+        # split the points into chunks along the last trailing axis
+        if trailing_axes == 0:
+            chunks = [None]
+        else:
+            if chunksize is None:
+                itemsize = 8 * (fun.nnz_in() + fun.nnz_out())
+                chunksize = get_memory_budget() // itemsize
+
+            size = N // ax[-1]
+            step = max(1, chunksize // size)
+            chunks = [slice(a, a + step) for a in range(0, ax[-1], step)]
+
+        for chunk in chunks:
+            if chunk is None:
+                n = N
+                r = res
+            else:
+                n = size * len(range(*chunk.indices(ax[-1])))
+                r = [o[..., chunk] for o in res]
+
+            y = [flatten(z, i, chunk, n) for i, z in enumerate(x)]
+
+            # more threads than points are not used
+            times += evaluate(fun, n, y, r, threads=min(threads, n), nonzeros=nonzeros)
+
+        return perf_counter() - begin, *times
+
+    setup = perf_counter() - start
+
+    begin = perf_counter()
+
+    # the phases of the (fastest) candidate of an autotuned evaluation are recorded,
+    # the time of the other candidates is recorded as autotuning
+    if threads == "auto":
+        time, *times = autotuner.run(fun, N, run)
+        tune = max(0.0, perf_counter() - begin - time)
+    else:
+        time, *times = run(threads, chunksize)
+        tune = 0.0
+
+    if stats is not None:
+        stats.record(method, N, start, setup + tune + time, *times, nbytes, tune)
+
+    return res
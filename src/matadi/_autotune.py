@@ -0,0 +1,117 @@
+import json
+import os
+from multiprocessing import cpu_count
+from threading import Lock
+from time import perf_counter
+from weakref import WeakKeyDictionary
+
+from ._cache import digest, directory
+
+
+class Autotuner:
+    """Autotuner of the number of threads and the chunksize of evaluations. For each
+    casADi function and range of the number of points, all candidates are timed on
+    the first evaluation and the fastest one is reused for subsequent evaluations.
+    The ranges of the number of points are bounded by powers of two."""
+
+    def __init__(self, threads=None, chunksizes=(None, 2**12, 2**16)):
+        if threads is None:
+            threads = sorted({min(2**a, cpu_count()) for a in range(cpu_count())})
+
+        self.threads = list(threads)
+        self.chunksizes = list(chunksizes)
+
+        # fastest candidates, keyed by function and range of the number of points
+        self.table = {}
+
+        self._keys = WeakKeyDictionary()
+        self._lock = Lock()
+
+    def key(self, fun, N):
+        "Return the key of the casADi function and the range of the number of points."
+
+        if fun not in self._keys:
+            self._keys[fun] = "%s_%s" % (fun.name(), digest(fun.serialize())[:16])
+
+        bits = int(N).bit_length()
+
+        return self._keys[fun], (2 ** (bits - 1), 2**bits - 1)
+
+    def candidates(self, N):
+        "Return the candidates (threads, chunksize) for `N` points."
+        return [
+            (threads, chunksize)
+            for threads in self.threads
+            for chunksize in self.chunksizes
+            if threads <= N and (chunksize is None or chunksize < N)
+        ]
+
+    def run(self, fun, N, evaluate):
+        """Run `evaluate(threads, chunksize)` with the tuned candidate of the casADi
+        function `fun` on `N` points and return its result. If not tuned yet, all
+        candidates are timed and the result of the fastest one is returned."""
+
+        key = self.key(fun, N)
+
+        if key in self.table:
+            threads, chunksize, seconds = self.table[key]
+            return evaluate(threads, chunksize)
+
+        timings = []
+
+        for threads, chunksize in self.candidates(N):
+            start = perf_counter()
+            result = evaluate(threads, chunksize)
+            timings.append((perf_counter() - start, threads, chunksize, result))
+
+        seconds, threads, chunksize, result = min(timings, key=lambda t: t[0])
+
+        with self._lock:
+            self.table[key] = (threads, chunksize, seconds)
+
+        return result
+
+    def clear(self):
+        "Clear the table of tuned candidates."
+        with self._lock:
+            self.table.clear()
+
+    def save(self, path=None):
+        """Save the table of tuned candidates as JSON file (default is `autotune.json`
+        in the directory of the on-disk cache)."""
+
+        if path is None:
+            path = os.path.join(directory(), "autotune.json")
+
+        records = [
+            {
+                "function": function,
+                "points": list(points),
+                "threads": threads,
+                "chunksize": chunksize,
+                "seconds": seconds,
+            }
+            for (function, points), (threads, chunksize, seconds) in self.table.items()
+        ]
+
+        with open(path, "w") as f:
+            json.dump(records, f, indent=2)
+
+    def load(self, path=None):
+        """Load a table of tuned candidates from a JSON file (default is
+        `autotune.json` in the directory of the on-disk cache)."""
+
+        if path is None:
+            path = os.path.join(directory(), "autotune.json")
+
+        with open(path) as f:
+            records = json.load(f)
+
+        with self._lock:
+            for r in records:
+                key = r["function"], tuple(r["points"])
+                self.table[key] = (r["threads"], r["chunksize"], r["seconds"])
+
+
+# autotuner of evaluations with `threads="auto"`
+autotuner = Autotuner()
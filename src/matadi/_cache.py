@@ -0,0 +1,98 @@
+import hashlib
+import os
+import subprocess
+from tempfile import TemporaryDirectory
+
+import casadi as ca
+
+
+def directory():
+    """Return the directory of the on-disk cache, given by the environment variable
+    `MATADI_CACHE_DIR` (default is `~/.cache/matadi`)."""
+
+    path = os.environ.get(
+        "MATADI_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "matadi")
+    )
+    os.makedirs(path, exist_ok=True)
+
+    return path
+
+
+def digest(*items):
+    "Return a hash of the string representations of the given items."
+    return hashlib.sha256("\n".join(str(item) for item in items).encode()).hexdigest()
+
+
+def compiled(fun):
+    """Return the casADi function `fun` as an external function, loaded from a shared
+    library. The C code of the function is generated and compiled by the C compiler
+    of the environment variable `CC` (default is `cc`). Compiled libraries are cached
+    on disk, keyed by a hash of the expression graph."""
+
+    compiler = os.environ.get("CC", "cc")
+    flags = ["-O2", "-fPIC", "-shared"]
+
+    name = "%s_%s" % (
+        fun.name(),
+        digest(fun.serialize(), ca.__version__, compiler, *flags)[:32],
+    )
+    library = os.path.join(directory(), name + (".dll" if os.name == "nt" else ".so"))
+
+    if not os.path.isfile(library):
+        with TemporaryDirectory(dir=directory()) as tmp:
+            codegen = ca.CodeGenerator(name + ".c", {"with_header": False})
+            codegen.add(fun)
+            codegen.generate(tmp + os.sep)
+
+            target = os.path.join(tmp, os.path.basename(library))
+            process = subprocess.run(
+                [compiler, *flags, os.path.join(tmp, name + ".c"), "-o", target, "-lm"],
+                capture_output=True,
+                text=True,
+            )
+
+            if process.returncode != 0:
+                raise RuntimeError(
+                    f"Compilation of function `{fun.name()}` failed.\n{process.stderr}"
+                )
+
+            # concurrent compilations of the same library are replaced atomically
+            os.replace(target, library)
+
+    return ca.external(fun.name(), library)
+
+
+def compiled_default():
+    """Return the default of the compiled mode, given by the environment variable
+    `MATADI_COMPILED` (default is `0`)."""
+    return os.environ.get("MATADI_COMPILED", "0") == "1"
+
+
+def cache_default():
+    """Return the default of the on-disk cache of casADi functions, given by the
+    environment variable `MATADI_CACHE` (default is `0`)."""
+    return os.environ.get("MATADI_CACHE", "0") == "1"
+
+
+def load(key):
+    "Return the casADi function stored under `key` in the on-disk cache (or None)."
+
+    path = os.path.join(directory(), key + ".casadi")
+
+    if os.path.isfile(path):
+        try:
+            return ca.Function.load(path)
+        except RuntimeError:
+            return None
+
+
+def store(key, fun):
+    "Store the casADi function `fun` under `key` in the on-disk cache."
+
+    path = os.path.join(directory(), key + ".casadi")
+
+    with TemporaryDirectory(dir=directory()) as tmp:
+        fun.save(os.path.join(tmp, "fun.casadi"))
+
+        # concurrent writes of the same function are replaced atomically
+        os.replace(os.path.join(tmp, "fun.casadi"), path)
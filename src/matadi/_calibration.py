@@ -0,0 +1,149 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.optimize import least_squares
+
+
+class Calibration:
+    """Calibration of the symbolic parameters of a material on experimental data of
+    homogeneous load cases. The stresses of all data points of all load cases are
+    evaluated by the lab in one batched call per evaluation of the residuals, and
+    the jacobian of the residuals w.r.t. the parameters is given analytically by the
+    sensitivities of the material.
+
+    Experiments are either data of a lab (e.g. the results of `lab.run()`) or tuples
+    `(label, deformation, stress)` with the label of the load case ("uniaxial",
+    "biaxial", "planar" or "shear"), the stretches (or shear deformations) and the
+    measured stresses."""
+
+    def __init__(self, lab, experiments, weights=None):
+        self.lab = lab
+
+        material = getattr(lab.material, "W", lab.material)
+        self.parameters = dict(material._parameters)
+
+        if not self.parameters:
+            raise ValueError("The material has no symbolic parameters.")
+
+        if weights is None:
+            weights = np.ones(len(experiments))
+
+        labels, deformations, stresses, w = [], [], [], []
+
+        for experiment, weight in zip(experiments, weights):
+            label, deformation, stress = self._experiment(experiment)
+            stress = np.ravel(stress).astype(float)
+
+            labels.append(np.full(len(stress), label))
+            deformations.append(np.broadcast_to(deformation, stress.shape))
+            stresses.append(stress)
+            w.append(np.broadcast_to(weight, stress.shape))
+
+        self.labels = np.concatenate(labels)
+        self.x = np.concatenate(deformations).astype(float)
+        self.stress = np.concatenate(stresses)
+        self.weights = np.concatenate(w).astype(float)
+
+    @staticmethod
+    def _experiment(experiment):
+        "Return the label, the deformation and the stresses of an experiment."
+
+        if hasattr(experiment, "label"):
+            e = experiment
+            return e.label, e.shear if e.label == "shear" else e.stretch, e.stress
+
+        return experiment
+
+    @property
+    def x0(self):
+        "Vector of the initial (default) values of all parameters."
+        return np.concatenate([np.ravel(v) for v in self.parameters.values()]) * 1.0
+
+    def unpack(self, values):
+        "Return the dict of parameters of a vector of values."
+
+        sizes = [np.size(v) for v in self.parameters.values()]
+        splits = np.split(np.asarray(values, dtype=float), np.cumsum(sizes)[:-1])
+
+        return {
+            name: float(v[0]) if np.ndim(default) == 0 else tuple(v.tolist())
+            for (name, default), v in zip(self.parameters.items(), splits)
+        }
+
+    def residuals(self, values, jacobian=False):
+        """Return the weighted residuals of the model stresses and the measured
+        stresses for a vector of parameters (and optionally their jacobian)."""
+
+        res = self.lab.evaluate(
+            self.labels, self.x, parameters=self.unpack(values), jacobian=jacobian
+        )
+
+        if not jacobian:
+            return self.weights * (res - self.stress)
+
+        stress, dstress = res
+        return self.weights * (stress - self.stress), self.weights[:, None] * dstress
+
+    def _solve(self, x0, **kwargs):
+        "Run one least-squares optimization from a start vector."
+
+        # residuals and jacobian are evaluated together and reused by the jacobian
+        last = {}
+
+        def evaluate(values):
+            key = values.tobytes()
+
+            if key not in last:
+                last.clear()
+                last[key] = self.residuals(values, jacobian=True)
+
+            return last[key]
+
+        return least_squares(
+            lambda v: evaluate(v)[0], x0, jac=lambda v: evaluate(v)[1], **kwargs
+        )
+
+    def fit(
+        self,
+        x0=None,
+        bounds=(-np.inf, np.inf),
+        starts=1,
+        workers=None,
+        seed=None,
+        **kwargs,
+    ):
+        """Fit the parameters by `scipy.optimize.least_squares` (with keyword
+        arguments) and return the result of the best start. The fitted parameters
+        are available as dict `result.parameters` and the results of all starts as
+        `result.starts`.
+
+        Additional start vectors are drawn uniformly within finite bounds (or
+        between half and twice the initial values otherwise) and all starts are run
+        concurrently by a thread pool with `workers`."""
+
+        x0 = self.x0 if x0 is None else np.asarray(x0, dtype=float)
+        lower, upper = [np.broadcast_to(b, x0.shape).astype(float) for b in bounds]
+
+        rng = np.random.default_rng(seed)
+        vectors = [x0]
+
+        for start in range(starts - 1):
+            finite = np.isfinite(lower) & np.isfinite(upper)
+            vector = np.where(
+                finite,
+                rng.uniform(np.where(finite, lower, 0), np.where(finite, upper, 1)),
+                x0 * rng.uniform(0.5, 2.0, x0.shape),
+            )
+            vectors.append(np.clip(vector, lower, upper))
+
+        def solve(vector):
+            return self._solve(vector, bounds=(lower, upper), **kwargs)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(solve, vectors))
+
+        result = min(results, key=lambda r: r.cost)
+        result.parameters = self.unpack(result.x)
+        result.starts = results
+
+        return result
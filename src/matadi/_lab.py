@@ -0,0 +1,120 @@
+from collections import namedtuple
+
+import numpy as np
+
+LABELS = ("uniaxial", "biaxial", "planar", "shear")
+
+Data = namedtuple("Data", "label stretch stretch_2 stretch_3 shear stress stability")
+
+
+def deformation(labels, x):
+    """Return the deformation gradients of incompressible load cases `labels`
+    ("uniaxial", "biaxial", "planar" or "shear") at the stretches or shear
+    deformations `x`."""
+
+    labels = np.asarray(labels)
+    x = np.asarray(x, dtype=float)
+
+    ux, bx, ps, sh = [labels == label for label in LABELS]
+    stretch = np.where(sh, 1, x)
+
+    F = np.zeros((3, 3, len(x)), order="F")
+    F[0, 0] = stretch
+    F[1, 1] = np.select([ux, bx], [1 / np.sqrt(stretch), stretch], 1)
+    F[2, 2] = np.select(
+        [ux, bx, ps], [1 / np.sqrt(stretch), 1 / stretch**2, 1 / stretch], 1
+    )
+    F[0, 1] = np.where(sh, x, 0)
+
+    return F
+
+
+def stability(A):
+    """Check whether all incremental stretches due to unit normal forces are
+    positive, evaluated for all points of the stacked hessians."""
+
+    # convert hessians to (3, 3) matrices
+    i = np.arange(3)
+    B = A[i[:, None], i[:, None], i, i].transpose(2, 0, 1)
+
+    # calculate linear solution of stretches resulting from unit loads
+    dl = np.linalg.inv(B).diagonal(axis1=1, axis2=2)
+
+    return np.all(dl > 0, axis=1)
+
+
+def run(
+    states,
+    ux=True,
+    bx=True,
+    ps=True,
+    shear=True,
+    stretch_min=None,
+    stretch_max=2.5,
+    shear_max=1.0,
+    num=50,
+    executor=None,
+    chunksize=None,
+):
+    """Run the active load cases by a function `states(labels, x)`, which returns the
+    stretches in directions 2 and 3, the stresses and the stability of data points.
+    Optionally, chunks of the data points (default one chunk per load case) are
+    evaluated concurrently by an executor. The results are always returned in the
+    order of the load cases."""
+
+    if stretch_min is None:
+        stretch_min = max(0, 1 - (stretch_max - 1) / 5)
+
+    deformations = {
+        "uniaxial": np.linspace(stretch_min, stretch_max, num),
+        "biaxial": np.linspace(1, (stretch_max - 1) / 2 + 1, num),
+        "planar": np.linspace(1, stretch_max, num),
+        "shear": np.linspace(0, shear_max, num),
+    }
+    labels = [label for label, active in zip(LABELS, [ux, bx, ps, shear]) if active]
+
+    if not labels:
+        return []
+
+    points = np.repeat(labels, num)
+    x = np.concatenate([deformations[label] for label in labels])
+
+    if executor is None:
+        # evaluate all load cases in one batch
+        stretch_2, stretch_3, stress, stable = states(points, x)
+
+    else:
+        if chunksize is None:
+            chunksize = num
+
+        chunks = [slice(a, a + chunksize) for a in range(0, len(x), chunksize)]
+        results = executor.map(
+            states, [points[c] for c in chunks], [x[c] for c in chunks]
+        )
+        stretch_2, stretch_3, stress, stable = [
+            np.concatenate(r) for r in zip(*results)
+        ]
+
+    out = []
+
+    for a, label in enumerate(labels):
+        n = slice(a * num, (a + 1) * num)
+
+        if label == "shear":
+            stretch, gamma, stable_n = 1, deformations[label], np.full(num, None)
+        else:
+            stretch, gamma, stable_n = deformations[label], 0, stable[n]
+
+        out.append(
+            Data(
+                label,
+                stretch,
+                stretch_2[n],
+                stretch_3[n],
+                gamma,
+                stress[n],
+                stable_n,
+            )
+        )
+
+    return out
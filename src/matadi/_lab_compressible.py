@@ -1,8 +1,9 @@
-from collections import namedtuple
+from functools import partial
 
 import matplotlib.pyplot as plt
 import numpy as np
-from scipy.optimize import root
+
+from ._lab import deformation, run, stability
 
 
 class LabCompressible:
@@ -17,145 +18,230 @@ class LabCompressible:
             [m.title() for m in self.material.fun.__name__.split("_")]
         )
 
-    def _uniaxial(self, stretch):
-        "Load case `uniaxial`."
+    def _newton(self, labels, x, parameters=None, tol=1e-10, maxiter=50, start=None):
+        """Return the deformation gradients with stress-free lateral directions, the
+        stresses and the hessians of data points of the load cases `labels`
+        ("uniaxial", "biaxial", "planar" or "shear") at the stretches or shear
+        deformations `x`, together with the mask of converged points. The lateral
+        stretches of all data points are obtained by one batched Newton iteration,
+        starting from given lateral stretches (of shape `(N, 2)`) or from the
+        stretches of the incompressible load cases."""
 
-        def stress(stretch, stretch_2, stretch_3):
-            "Evaluate the first Piola-Kirchhoff stress tensor."
-            F = np.diag([stretch, stretch_2, stretch_3])
-            return self.material.gradient([F])[0]
+        F = deformation(labels, x)
 
-        def stability(stretch, stretches_23):
-            F = np.diag([stretch, *stretches_23])
-            A = self.material.hessian([F])[0]
+        # the stretch in direction 2 is unknown for uniaxial and shear load cases
+        free = np.isin(labels, ["uniaxial", "shear"]).astype(float)
 
-            # convert hessian to (3, 3) matrix
-            B = np.zeros((3, 3))
-            c = [(0, 0), (1, 1), (2, 2)]
+        if start is not None:
+            F[1, 1] = np.where(free > 0, start[:, 0], F[1, 1])
+            F[2, 2] = start[:, 1]
 
-            for i, a in enumerate(c):
-                for j, b in enumerate(c):
-                    B[i, j] = A[(*a, *b)]
+        converged = np.zeros(len(free), dtype=bool)
 
-            # unit forces in all directions
-            # calculate linear solution of stretch 1 resulting from unit load
-            dl = np.diag(np.linalg.inv(B))
+        for iteration in range(maxiter + 1):
+            (P, _), (A,) = self.material.evaluate(
+                [F], outputs=("gradient", "hessian"), parameters=parameters
+            )
+            r, K = self._system(P, A, free)
+            dx = np.linalg.solve(K, r[..., None])[..., 0]
 
-            return np.all(dl > 0)
+            # keep the lateral stretches of points with undefined stresses
+            undefined = ~np.all(np.isfinite(dx), axis=1)
+            dx[undefined] = 0
 
-        def stress_free(stretches_23, stretch):
-            s = stress(stretch, *stretches_23)
-            return [s[1, 1], s[2, 2]]
+            converged = np.all(abs(dx) < tol, axis=1) & ~undefined
 
-        res = root(stress_free, np.ones(2), args=(stretch,))
-        if not res.success:
-            res = root(stress_free, np.ones(2) * 1 / np.sqrt(stretch), args=(stretch,))
+            if np.all(converged | undefined) or iteration == maxiter:
+                break
 
-        return (
-            stress(stretch, *res.x)[0, 0],
-            *res.x,
-            stability(stretch, res.x),
-        )
+            # limit the steps to keep the lateral stretches positive
+            F[1, 1] -= np.minimum(dx[:, 0], F[1, 1] / 2)
+            F[2, 2] -= np.minimum(dx[:, 1], F[2, 2] / 2)
 
-    def _biaxial(self, stretch):
-        "Load case `equi-biaxial`."
+        return F, P, A, free, converged
 
-        def stress(stretch, stretch_3):
-            "Evaluate the first Piola-Kirchhoff stress tensor."
-            F = np.diag([stretch, stretch, stretch_3])
-            return self.material.gradient([F])[0]
+    def _follow(self, labels, x, parameters=None, tol=1e-10, maxiter=10, steps=1000):
+        """Solve the lateral stretches of data points by path-following from the
+        undeformed state along the load cases, see `_newton()`. Each step is started
+        from the secant extrapolation of the last two converged states of its path.
+        The step size is twice the last converged step or it is halved otherwise (a data
+        point is skipped after ten halvings of the initial step size). The steps of
+        all paths are solved together by batched Newton iterations."""
 
-        def stability(stretch, stretch_3):
-            F = np.diag([stretch, stretch, stretch_3])
-            A = self.material.hessian([F])[0]
+        labels = np.asarray(labels)
+        x = np.asarray(x, dtype=float)
 
-            # convert hessian to (3, 3) matrix
-            B = np.zeros((3, 3))
-            c = [(0, 0), (1, 1), (2, 2)]
+        # paths from the undeformed state to the data points (ordered by distance)
+        paths = []
 
-            for i, a in enumerate(c):
-                for j, b in enumerate(c):
-                    B[i, j] = A[(*a, *b)]
+        for label in np.unique(labels):
+            origin = 0.0 if label == "shear" else 1.0
 
-            # unit forces in all directions
-            # calculate linear solution of stretch 1 resulting from unit load
-            dl = np.diag(np.linalg.inv(B))
+            for sign, branch in [(1, x >= origin), (-1, x < origin)]:
+                points = np.flatnonzero((labels == label) & branch)
+                points = points[np.argsort(abs(x[points] - origin), kind="stable")]
 
-            return np.all(dl > 0)
+                if len(points):
+                    paths.append((label, sign, origin, points))
 
-        def stress_free(stretch_3, stretch):
-            return [stress(stretch, *stretch_3)[2, 2]]
+        label, sign, origin, points = zip(*paths)
+        label, sign, current = np.array(label), np.array(sign), np.array(origin)
 
-        res = root(stress_free, np.ones(1), args=(stretch,))
-        stretch_3 = res.x[0]
+        lateral = np.ones((len(x), 2))
+        state, slope = np.ones((len(paths), 2)), np.zeros((len(paths), 2))
 
-        return (
-            stress(stretch, stretch_3)[0, 0],
-            stretch,
-            stretch_3,
-            stability(stretch, stretch_3),
+        # initial step sizes by the mean distances of the data points
+        size = np.array(
+            [max(abs(x[p[-1]] - c) / len(p), tol) for p, c in zip(points, current)]
         )
+        minsize = size / 2**10
+        index = np.zeros(len(paths), dtype=int)
+        active = np.ones(len(paths), dtype=bool)
+
+        for step in range(steps):
+            if not np.any(active):
+                break
+
+            b = np.flatnonzero(active)
+            target = np.array([x[points[i][index[i]]] for i in b])
+
+            # trial stretches and predicted lateral stretches
+            reached = abs(target - current[b]) <= size[b]
+            trial = np.where(reached, target, current[b] + sign[b] * size[b])
+            predictor = state[b] + slope[b] * (trial - current[b])[:, None]
+
+            F, P, A, free, converged = self._newton(
+                label[b], trial, parameters, tol, maxiter, predictor
+            )
+            solution = np.stack([F[1, 1], F[2, 2]], axis=1)
+
+            for j, i in enumerate(b):
+                if converged[j]:
+                    # accept the step and update the secant of the path
+                    if trial[j] != current[i]:
+                        slope[i] = (solution[j] - state[i]) / (trial[j] - current[i])
+
+                    size[i] = 2 * max(abs(trial[j] - current[i]), minsize[i])
+                    current[i], state[i] = trial[j], solution[j]
+
+                    if not reached[j]:
+                        continue
+
+                elif size[i] > minsize[i]:
+                    # retry with a smaller step
+                    size[i] /= 2
+                    continue
+
+                # store the solution of the data point (not converged for tiny steps)
+                lateral[points[i][index[i]]] = solution[j]
+                index[i] += 1
+
+                if index[i] == len(points[i]):
+                    active[i] = False
+
+                elif not converged[j]:
+                    size[i] = abs(x[points[i][index[i]]] - current[i])
+
+        return self._newton(labels, x, parameters, tol, maxiter, lateral)
+
+    def _solve(
+        self, labels, x, parameters=None, tol=1e-10, maxiter=50, continuation=None
+    ):
+        """Solve the lateral stretches of data points by one batched Newton iteration
+        (`continuation=False`), by path-following (`continuation=True`) or by
+        path-following only for the points which are not converged by the batched
+        Newton iteration (default)."""
 
-    def _planar(self, stretch):
-        "Load case `planar shear`."
+        labels = np.asarray(labels)
+        x = np.asarray(x, dtype=float)
 
-        def stress(stretch, stretch_3):
-            "Evaluate the first Piola-Kirchhoff stress tensor."
-            F = np.diag([stretch, 1, stretch_3])
-            return self.material.gradient([F])[0]
+        if continuation:
+            return self._follow(labels, x, parameters, tol)
 
-        def stability(stretch, stretch_3):
-            F = np.diag([stretch, 1, stretch_3])
-            A = self.material.hessian([F])[0]
+        F, P, A, free, converged = self._newton(labels, x, parameters, tol, maxiter)
 
-            # convert hessian to (3, 3) matrix
-            B = np.zeros((3, 3))
-            c = [(0, 0), (1, 1), (2, 2)]
+        # points with non-converged (but defined) lateral stretches
+        retry = ~converged & np.all(np.isfinite(P.reshape(9, -1)), axis=0)
 
-            for i, a in enumerate(c):
-                for j, b in enumerate(c):
-                    B[i, j] = A[(*a, *b)]
+        if continuation is None and np.any(retry):
+            results = self._follow(labels[retry], x[retry], parameters, tol)
 
-            # init unit forces in all directions
-            # calculate linear solution of stretch 1 resulting from unit load
-            dl = np.diag(np.linalg.inv(B))
+            for array, result in zip([F, P, A, free, converged], results):
+                array[..., retry] = result
 
-            return np.all(dl > 0)
+        return F, P, A, free, converged
 
-        def stress_free(stretch_3, stretch):
-            return [stress(stretch, *stretch_3)[2, 2]]
+    @staticmethod
+    def _system(P, A, free):
+        """Return the residuals (stresses of the lateral directions) and their
+        derivatives w.r.t. the lateral stretches."""
 
-        res = root(stress_free, np.ones(1), args=(stretch,))
-        stretch_3 = res.x[0]
+        r = np.stack([free * P[1, 1], P[2, 2]], axis=1)
 
-        return (
-            stress(stretch, stretch_3)[0, 0],
-            1,
-            stretch_3,
-            stability(stretch, stretch_3),
+        K = np.empty((len(r), 2, 2))
+        K[:, 0, 0] = free * A[1, 1, 1, 1] + (1 - free)
+        K[:, 0, 1] = free * A[1, 1, 2, 2]
+        K[:, 1, 0] = free * A[2, 2, 1, 1]
+        K[:, 1, 1] = A[2, 2, 2, 2]
+
+        return r, K
+
+    def evaluate(
+        self,
+        labels,
+        x,
+        parameters=None,
+        jacobian=False,
+        tol=1e-10,
+        maxiter=50,
+        continuation=None,
+    ):
+        """Return the stresses of data points of the load cases `labels` ("uniaxial",
+        "biaxial", "planar" or "shear") at the stretches or shear deformations `x`.
+        Optionally, the derivatives of the stresses w.r.t. the symbolic parameters of
+        the material (including the implicit dependency of the lateral stretches) are
+        returned as columns of a second array."""
+
+        F, P, A, free, converged = self._solve(
+            labels, x, parameters, tol, maxiter, continuation
         )
 
-    def _shear(self, shear):
-        "Load case `Shear`."
+        # index of the stress of the load cases (shear or normal)
+        b = (np.asarray(labels) == "shear").astype(int)
+        points = np.arange(len(free))
 
-        def stress(shear, stretch_2, stretch_3):
-            F = np.diag([1, stretch_2, stretch_3])
-            F[0, 1] = shear
-            return self.material.gradient([F])[0]
+        if not jacobian:
+            return P[0, b, points]
 
-        def stress_free(stretches, shear):
-            return [stress(shear, *stretches)[1, 1], stress(shear, *stretches)[2, 2]]
+        dW_dP = self.material.sensitivity([F], parameters=parameters)
 
-        res = root(stress_free, np.ones(2), args=(shear,))
-        stretches = res.x
+        # derivatives of the stress tensor w.r.t. all (flattened) parameters
+        dP = np.concatenate(
+            [d.reshape(3, 3, -1, len(free)) for d in dW_dP[len(dW_dP) // 2 :]], axis=2
+        )
 
-        return (
-            stress(shear, *stretches)[0, 1],
-            stretches[0],
-            stretches[1],
-            None,
+        # derivatives of the lateral stretches w.r.t. the parameters
+        r, K = self._system(P, A, free)
+        dr = np.stack([free * dP[1, 1], dP[2, 2]], axis=0).transpose(2, 0, 1)
+        dl = -np.linalg.solve(K, dr)
+
+        # total derivatives of the stresses w.r.t. the parameters
+        ds = dP[0, b, :, points] + (
+            A[0, b, 1, 1, points][:, None] * dl[:, 0]
+            + A[0, b, 2, 2, points][:, None] * dl[:, 1]
         )
 
+        return P[0, b, points], ds
+
+    def _states(self, labels, x, continuation=None):
+        """Return the stretches in directions 2 and 3, the stresses and the stability
+        of data points with stress-free lateral directions."""
+
+        F, P, A, free, converged = self._solve(labels, x, continuation=continuation)
+        stress = np.where(np.asarray(labels) == "shear", P[0, 1], P[0, 0])
+
+        return F[1, 1], F[2, 2], stress, stability(A)
+
     def run(
         self,
         ux=True,
@@ -166,84 +252,31 @@ class LabCompressible:
         stretch_max=2.5,
         shear_max=1.0,
         num=50,
+        executor=None,
+        chunksize=None,
+        continuation=None,
     ):
-        "Run load cases `UX/BX/PS/Simple-Shear (Incompressible)`."
-
-        out = []
-
-        Data = namedtuple(
-            "Data", "label stretch stretch_2 stretch_3 shear stress stability"
+        """Run load cases `UX/BX/PS/Simple-Shear`. Optionally, the load cases (or
+        chunks of data points) are evaluated concurrently by a thread- or
+        process-pool `executor`. The lateral stretches are solved by path-following
+        for all points (`continuation=True`), for none of them (`False`) or only for
+        the points which are not converged by the batched Newton iteration (default).
+        """
+
+        return run(
+            partial(self._states, continuation=continuation),
+            ux=ux,
+            bx=bx,
+            ps=ps,
+            shear=shear,
+            stretch_min=stretch_min,
+            stretch_max=stretch_max,
+            shear_max=shear_max,
+            num=num,
+            executor=executor,
+            chunksize=chunksize,
         )
 
-        if ux:
-            if stretch_min is None:
-                stretch_min = max(0, 1 - (stretch_max - 1) / 5)
-
-            stretch_ux = np.linspace(stretch_min, stretch_max, num)
-            stress_ux, stretch_2_ux, stretch_3_ux, stability_ux = np.array(
-                [self._uniaxial(s11) for s11 in stretch_ux]
-            ).T
-            ux_data = Data(
-                "uniaxial",
-                stretch_ux,
-                stretch_2_ux,
-                stretch_3_ux,
-                0,
-                stress_ux,
-                stability_ux,
-            )
-            out.append(ux_data)
-
-        if bx:
-            stretch_bx = np.linspace(1, (stretch_max - 1) / 2 + 1, num)
-            stress_bx, stretch_2_bx, stretch_3_bx, stability_bx = np.array(
-                [self._biaxial(s11) for s11 in stretch_bx]
-            ).T
-            bx_data = Data(
-                "biaxial",
-                stretch_bx,
-                stretch_2_bx,
-                stretch_3_bx,
-                0,
-                stress_bx,
-                stability_bx,
-            )
-            out.append(bx_data)
-
-        if ps:
-            stretch_ps = np.linspace(1, stretch_max, num)
-            stress_ps, stretch_2_ps, stretch_3_ps, stability_ps = np.array(
-                [self._planar(s11) for s11 in stretch_ps]
-            ).T
-            ps_data = Data(
-                "planar",
-                stretch_ps,
-                stretch_2_ps,
-                stretch_3_ps,
-                0,
-                stress_ps,
-                stability_ps,
-            )
-            out.append(ps_data)
-
-        if shear:
-            deformation_sh = np.linspace(0, shear_max, num)
-            stress_shear, stretch_2_sh, stretch_3_sh, stability_sh = np.array(
-                [self._shear(g) for g in deformation_sh]
-            ).T
-            shear_data = Data(
-                "shear",
-                1,
-                stretch_2_sh,
-                stretch_3_sh,
-                deformation_sh,
-                stress_shear,
-                stability_sh,
-            )
-            out.append(shear_data)
-
-        return out
-
     def plot(self, data, stability=False):
         "Plot results of UX/BX/PS load cases."
 
@@ -1,12 +1,25 @@
-from collections import namedtuple
+from functools import lru_cache
 
 import matplotlib.pyplot as plt
 import numpy as np
 
+from ._lab import deformation, run, stability
 from ._templates import MaterialHyperelastic
 from .math import det, log
 
 
+def volumetric(F, p):
+    "Volumetric parts of the strain energy function (required for stability)."
+    return 1e6 * log(det(F)) ** 2 / 2 + p * det(F)
+
+
+@lru_cache(maxsize=None)
+def auxiliary():
+    """Return the auxiliary material of the volumetric parts of the strain energy
+    function with the hydrostatic stress as symbolic parameter, generated once."""
+    return MaterialHyperelastic(volumetric, parameters=["p"], p=0.0)
+
+
 class LabIncompressible:
     def __init__(self, material, title=None):
         self.material = material
@@ -19,78 +32,57 @@ class LabIncompressible:
             [m.title() for m in self.material.fun.__name__.split("_")]
         )
 
-    def _ux(self, stretch):
-        "Principal stretches of incompressible uniaxial load case."
-        return stretch, 1 / np.sqrt(stretch), 1 / np.sqrt(stretch)
+    def evaluate(self, labels, x, parameters=None, jacobian=False):
+        """Return the stresses of data points of the load cases `labels` ("uniaxial",
+        "biaxial", "planar" or "shear") at the stretches or shear deformations `x`,
+        evaluated by one batched call of the material. Optionally, the derivatives of
+        the stresses w.r.t. the symbolic parameters of the material are returned as
+        columns of a second array."""
 
-    def _bx(self, stretch):
-        "Principal stretches of incompressible equi-biaxial load case."
-        return stretch, stretch, 1 / stretch**2
+        F = deformation(labels, x)
+        shear = np.asarray(labels) == "shear"
 
-    def _ps(self, stretch):
-        "Principal stretches of incompressible planar shear load case."
-        return stretch, 1, 1 / stretch
+        def stress(P):
+            "Stresses with resolved hydrostatic pressure due to incompressibility."
+            return np.where(shear, P[0, 1], P[0, 0] - F[2, 2] / F[0, 0] * P[2, 2])
 
-    def _loadcase(self, stretch, kinematics):
-        "Generalized load case `UX/BX/PS (Incompressible)`."
+        if not jacobian:
+            return stress(self.material.gradient([F], parameters=parameters)[0])
 
-        def stress(stretch):
-            "Evaluate the first Piola-Kirchhoff stress tensor."
-            F = np.diag([*kinematics(stretch)])
-            return self.material.gradient([F])[0]
-
-        def stress_free(stretch):
-            """First Piola-Kirchhoff stress tensor with resolved hydrostatic
-            pressure due to incompressibility."""
-            P = stress(stretch)
-            return P[0, 0] - kinematics(stretch)[-1] / stretch * P[-1, -1]
-
-        def stability(stretch):
-            F = np.diag([*kinematics(stretch)])
+        (P, _), dW_dP = self.material.evaluate(
+            [F], outputs=("gradient", "sensitivity"), parameters=parameters
+        )
 
-            P = self.material.gradient([F])[0]
-            A = self.material.hessian([F])[0]
+        # derivatives of the stress tensor w.r.t. all (flattened) parameters
+        dP = np.concatenate(
+            [d.reshape(3, 3, -1, F.shape[-1]) for d in dW_dP[len(dW_dP) // 2 :]], axis=2
+        )
 
-            # volumetric parts of strain energy function (required for stability)
-            U = lambda F: 1e6 * log(det(F)) ** 2 / 2
-            Ap = MaterialHyperelastic(U).hessian([F])[0]
-            d2JdFdF = MaterialHyperelastic(lambda F: det(F)).hessian([F])[0]
+        return stress(P), stress(dP).T
 
-            # hydrostatic stress
-            p = -P[-1, -1] * kinematics(stretch)[-1]
+    def _stability(self, F, P, A):
+        """Check the stability of incompressible states of deformation, evaluated for
+        all points by one batched hessian call of the (cached) auxiliary material."""
 
-            # convert hessian to (3, 3) matrix
-            B = np.zeros((3, 3))
-            for i in range(3):
-                for j in range(3):
-                    B[i, j] = (A + Ap + p * d2JdFdF)[i, i, j, j]
+        # hydrostatic stress
+        p = -P[2, 2] * F[2, 2]
 
-            # init unit force in direction 1
-            # calculate linear solution of stretch 1 resulting from unit load
-            dl = np.diag(np.linalg.inv(B))
+        # hessian of the volumetric parts of the strain energy function
+        Ap = auxiliary().hessian([F], parameters={"p": p})[0]
 
-            return np.all(dl > 0)
+        return stability(A + Ap)
 
-        return (
-            stress_free(stretch),
-            *kinematics(stretch)[1:],
-            stability(stretch),
-        )
+    def _states(self, labels, x):
+        """Return the stretches in directions 2 and 3, the stresses and the stability
+        of data points, evaluated by one batched call of the material."""
 
-    def _shear(self, shear):
-        "Load case `Simple Shear (Incompressible)`."
+        F = deformation(labels, x)
+        shear = np.asarray(labels) == "shear"
 
-        def stress(shear):
-            F = np.eye(3)
-            F[0, 1] = shear
-            return self.material.gradient([F])[0]
+        (P, _), (A,) = self.material.evaluate([F], outputs=("gradient", "hessian"))
+        stress = np.where(shear, P[0, 1], P[0, 0] - F[2, 2] / F[0, 0] * P[2, 2])
 
-        return (
-            stress(shear)[0, 1],
-            1,
-            1,
-            None,
-        )
+        return F[1, 1], F[2, 2], stress, self._stability(F, P, A)
 
     def run(
         self,
@@ -102,84 +94,27 @@ class LabIncompressible:
         stretch_max=2.5,
         shear_max=1.0,
         num=50,
+        executor=None,
+        chunksize=None,
     ):
-        "Run load cases `UX/BX/PS/Simple-Shear (Incompressible)`."
-
-        out = []
-
-        Data = namedtuple(
-            "Data", "label stretch stretch_2 stretch_3 shear stress stability"
+        """Run load cases `UX/BX/PS/Simple-Shear (Incompressible)`. Optionally, the
+        load cases (or chunks of data points) are evaluated concurrently by a thread-
+        or process-pool `executor`."""
+
+        return run(
+            self._states,
+            ux=ux,
+            bx=bx,
+            ps=ps,
+            shear=shear,
+            stretch_min=stretch_min,
+            stretch_max=stretch_max,
+            shear_max=shear_max,
+            num=num,
+            executor=executor,
+            chunksize=chunksize,
         )
 
-        if ux:
-            if stretch_min is None:
-                stretch_min = max(0, 1 - (stretch_max - 1) / 5)
-
-            stretch_ux = np.linspace(stretch_min, stretch_max, num)
-            stress_ux, stretch_2_ux, stretch_3_ux, stability_ux = np.array(
-                [self._loadcase(s11, kinematics=self._ux) for s11 in stretch_ux]
-            ).T
-            ux_data = Data(
-                "uniaxial",
-                stretch_ux,
-                stretch_2_ux,
-                stretch_3_ux,
-                0,
-                stress_ux,
-                stability_ux,
-            )
-            out.append(ux_data)
-
-        if bx:
-            stretch_bx = np.linspace(1, (stretch_max - 1) / 2 + 1, num)
-            stress_bx, stretch_2_bx, stretch_3_bx, stability_bx = np.array(
-                [self._loadcase(s11, kinematics=self._bx) for s11 in stretch_bx]
-            ).T
-            bx_data = Data(
-                "biaxial",
-                stretch_bx,
-                stretch_2_bx,
-                stretch_3_bx,
-                0,
-                stress_bx,
-                stability_bx,
-            )
-            out.append(bx_data)
-
-        if ps:
-            stretch_ps = np.linspace(1, stretch_max, num)
-            stress_ps, stretch_2_ps, stretch_3_ps, stability_ps = np.array(
-                [self._loadcase(s11, kinematics=self._ps) for s11 in stretch_ps]
-            ).T
-            ps_data = Data(
-                "planar",
-                stretch_ps,
-                stretch_2_ps,
-                stretch_3_ps,
-                0,
-                stress_ps,
-                stability_ps,
-            )
-            out.append(ps_data)
-
-        if shear:
-            deformation_sh = np.linspace(0, shear_max, num)
-            stress_shear, stretch_2_sh, stretch_3_sh, stability_sh = np.array(
-                [self._shear(g) for g in deformation_sh]
-            ).T
-            shear_data = Data(
-                "shear",
-                1,
-                1,
-                1,
-                deformation_sh,
-                stress_shear,
-                stability_sh,
-            )
-            out.append(shear_data)
-
-        return out
-
     def plot(self, data, stability=False):
         "Plot results of UX/BX/PS load cases."
 
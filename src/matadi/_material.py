@@ -3,20 +3,163 @@ from multiprocessing import cpu_count
 import casadi as ca
 import numpy as np
 
-from ._apply import apply
+from .__about__ import __version__
+from ._apply import apply, mapcache
+from ._apply import sparsity as _sparsity
+from ._cache import cache_default
+from ._cache import compiled as _compiled
+from ._cache import compiled_default, digest, load, store
+from ._profile import Stats
+from ._symmetric import PackedSymmetric, packed_entries
 from ._variable import Variable
 
 
-class Function:
-    def __init__(self, x, fun, args=(), kwargs={}, compress=False):
+class _Functions:
+    """Base class for the lazy generation of casADi function objects. On first access,
+    they are loaded from the on-disk cache or generated, optionally compiled."""
+
+    # casADi function objects of the methods
+    _functions = {"function": "_function"}
+
+    def _setup(self, compiled=None, cache=False, prewarm=()):
+        "Set the options of the casADi function objects and pre-warm some of them."
+
+        if compiled is None:
+            compiled = compiled_default()
+
+        if cache is None:
+            cache = cache_default()
+
+        self._compiled = compiled
+        self._key = None
+
+        if cache:
+            self._key = digest(
+                __version__,
+                ca.__version__,
+                type(self).__name__,
+                self._function.serialize(),
+                *self._options,
+            )
+
+        if compiled:
+            self._function = _compiled(self._function)
+
+        # sensitivities are only available with symbolic parameters
+        if prewarm is True:
+            prewarm = [m for m in self._functions if m != "sensitivity" or self._p]
+
+        for method in prewarm:
+            getattr(self, self._functions[method])
+
+    def __getattr__(self, name):
+        "Load or generate a casADi function object on first access."
+
+        if name not in type(self)._functions.values():
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'"
+            )
+
+        fun = self._build(name, self._generate, name)
+        setattr(self, name, fun)
+
+        return fun
+
+    def _build(self, key, generate, *args):
+        """Load a casADi function object from the on-disk cache or generate it by
+        `generate(*args)`, optionally compiled."""
+
+        fun = None
+
+        if self._key is not None:
+            fun = load(digest(self._key, key))
+
+        if fun is None:
+            fun = generate(*args)
+
+            if self._key is not None:
+                store(digest(self._key, key), fun)
+
+        if self._compiled:
+            fun = _compiled(fun)
+
+        return fun
+
+    def _symbolic(self, kwargs, parameters):
+        """Return the keyword arguments with symbolic parameters for the given names,
+        which are additional inputs of all casADi function objects."""
+
+        kwargs = dict(kwargs)
+
+        # default values and symbols of the parameters
+        self._parameters = {}
+        self._p = []
+
+        for name in parameters:
+            value = kwargs[name]
+
+            if np.ndim(value) == 0:
+                p = kwargs[name] = Variable(name, 1, 1)
+            else:
+                p = Variable(name, len(value), 1)
+                kwargs[name] = tuple(ca.vertsplit(p))
+
+            self._parameters[name] = value
+            self._p.append(p)
+
+        return kwargs
+
+    def _values(self, parameters=None):
+        """Return the list of values of the symbolic parameters, either scalars or
+        arrays with trailing axes (default values are taken from the kwargs)."""
+
+        if parameters is None:
+            parameters = {}
+
+        for name in parameters:
+            if name not in self._parameters:
+                raise ValueError(f"`{name}` is not a symbolic parameter.")
+
+        return [
+            np.asarray(parameters.get(name, value), dtype=float)
+            for name, value in self._parameters.items()
+        ]
+
+    def _shapes(self, method):
+        "Return the list of output shapes of a method."
+        return self._idx_function
+
+    def sparsity(self, method="function"):
+        """Return the sparsity patterns of the outputs of a method as tuples of indices
+        of the structural nonzeros in the output blocks, i.e. the results with
+        `nonzeros=True` are scattered by `dense[index] = nonzeros`."""
+        fun = getattr(self, self._functions[method])
+        return _sparsity(fun, self._shapes(method))
+
+    def cache_info(self):
+        "Return hits and misses of the cached mapped casADi functions."
+        functions = [self.__dict__.get(name) for name in self._functions.values()]
+        functions += self.__dict__.get("_fused", {}).values()
+        functions += self.__dict__.get("_blocks", {}).values()
+        return {
+            fun.name(): mapcache(fun).cache_info()
+            for fun in functions
+            if fun is not None
+        }
+
+
+class Function(_Functions):
+    def __init__(
+        self, x, fun, args=(), kwargs={}, compress=False, compiled=None, parameters=()
+    ):
         self.x = x
         self._fun = fun
 
         self.args = args
         self.kwargs = kwargs
 
-        # generate function
-        f = self._fun(self.x, *self.args, **self.kwargs)
+        # generate function (with symbolic parameters)
+        f = self._fun(self.x, *self.args, **self._symbolic(self.kwargs, parameters))
 
         # check if function is list or tuple
         if isinstance(f, list) or isinstance(f, tuple):
@@ -25,33 +168,52 @@ class Function:
             self._f = [f]
 
         # generate casADi function objects
-        self._function = ca.Function("f", self.x, self._f)
+        self._function = ca.Function("f", [*self.x, *self._p], self._f)
 
         # generate indices
         self._idx_x = [y.shape for y in x]
         self._idx_function = [y.shape for y in self._f]
 
-    def function(self, x, threads=cpu_count()):
+        self._options = ()
+        self.stats = Stats()
+        self._setup(compiled)
+
+    def function(
+        self,
+        x,
+        threads=cpu_count(),
+        out=None,
+        chunksize=None,
+        nonzeros=False,
+        parameters=None,
+    ):
         "Return the function."
         return apply(
-            x,
+            [*x, *self._values(parameters)],
             fun=self._function,
             x_shape=self._idx_x,
             fun_shape=self._idx_function,
             threads=threads,
+            out=out,
+            chunksize=chunksize,
+            nonzeros=nonzeros,
+            stats=self.stats,
+            method="function",
         )
 
 
-class FunctionTensor:
-    def __init__(self, x, fun, args=(), kwargs={}, compress=False):
+class FunctionTensor(_Functions):
+    def __init__(
+        self, x, fun, args=(), kwargs={}, compress=False, compiled=None, parameters=()
+    ):
         self.x = x
         self._fun = fun
 
         self.args = args
         self.kwargs = kwargs
 
-        # generate function
-        f = self._fun(self.x, *self.args, **self.kwargs)
+        # generate function (with symbolic parameters)
+        f = self._fun(self.x, *self.args, **self._symbolic(self.kwargs, parameters))
 
         # check if function is list or tuple
         if isinstance(f, list) or isinstance(f, tuple):
@@ -60,43 +222,79 @@ class FunctionTensor:
             self._f = [f]
 
         # generate casADi function objects
-        self._function = ca.Function("f", self.x, self._f)
+        self._function = ca.Function("f", [*self.x, *self._p], self._f)
 
         # generate indices
         self._idx_function = [y.shape for y in self._f]
         self._idx_x = self._idx_function[: len(self.x)]
 
-    def function(self, x, threads=cpu_count()):
+        self._options = ()
+        self.stats = Stats()
+        self._setup(compiled)
+
+    def function(
+        self,
+        x,
+        threads=cpu_count(),
+        out=None,
+        chunksize=None,
+        nonzeros=False,
+        parameters=None,
+    ):
         "Return the function."
         return apply(
-            x,
+            [*x, *self._values(parameters)],
             fun=self._function,
             x_shape=self._idx_x,
             fun_shape=self._idx_function,
             threads=threads,
+            out=out,
+            chunksize=chunksize,
+            nonzeros=nonzeros,
+            stats=self.stats,
+            method="function",
         )
 
 
 class Material(Function):
+    _functions = {
+        "function": "_function",
+        "gradient": "_gradient",
+        "hessian": "_hessian",
+        "gradient_vector_product": "_gradient_vector_product",
+        "hessian_vector_product": "_hessian_vector_product",
+        "sensitivity": "_sensitivity",
+    }
+
     def __init__(
-        self, x, fun, args=(), kwargs={}, compress=False, triu=True, statevars=0
+        self,
+        x,
+        fun,
+        args=(),
+        kwargs={},
+        compress=False,
+        triu=True,
+        statevars=0,
+        packed=False,
+        compiled=None,
+        cache=None,
+        prewarm=(),
+        parameters=(),
     ):
         # init Function
-        super().__init__(x=x, fun=fun, args=args, kwargs=kwargs)
+        super().__init__(
+            x=x,
+            fun=fun,
+            args=args,
+            kwargs=kwargs,
+            compiled=False,
+            parameters=parameters,
+        )
 
         # no. of active variables
         n = len(self.x) - statevars
         self._idx_gradient = self._idx_x[:n]
 
-        _h_diag = []
-        _hvp_diag = []
-
-        self._h = []
-        self._g = []
-
-        self._hvp = []
-        self._gvp = []
-
         # generate vectors for gradient- and hessian-vector products
         self.v = [Variable("v%d" % a, *x.shape) for a, x in enumerate(self.x)]
         self.u = [Variable("u%d" % a, *x.shape) for a, x in enumerate(self.x)]
@@ -104,39 +302,6 @@ class Material(Function):
         # alias
         self.jacobian = self.gradient
 
-        # generate list of diagonal hessian entries and gradients
-        # (including vector-products)
-        for x, v, u in zip(self.x[:n], self.v[:n], self.u[:n]):
-            _h, _g = ca.hessian(self._f[0], x)
-            _h_diag.append(_h)
-            self._g.append(_g)
-
-            _gvp = ca.jtimes(self._f[0], x, v)
-            _hvp = ca.jtimes(_gvp, x, u)
-            self._gvp.append(_gvp)
-            _hvp_diag.append(_hvp)
-
-        # generate upper-triangle of hessian (-vector-products)
-        for i, (g, gvp) in enumerate(zip(self._g, self._gvp)):
-            for j, (x, u) in enumerate(zip(self.x[:n], self.u[:n])):
-                if triu and j >= i or not triu:
-                    if i != j:
-                        self._h.append(ca.jacobian(g, x))
-                        self._hvp.append(ca.jtimes(gvp, x, u))
-                    else:
-                        self._h.append(_h_diag[i])
-                        self._hvp.append(_hvp_diag[i])
-
-        # generate casADi function objects
-        self._gradient = ca.Function("g", self.x, self._g)
-        self._hessian = ca.Function("h", self.x, self._h)
-        self._gradient_vector_product = ca.Function(
-            "gvp", [*self.x, *self.v], self._gvp
-        )
-        self._hessian_vector_product = ca.Function(
-            "hvp", [*self.x, *self.v, *self.u], self._hvp
-        )
-
         # generate indices
         self._idx_hessian = []
 
@@ -149,6 +314,9 @@ class Material(Function):
                 if np.all(np.array(self._idx_gradient[i]) == 1):
                     self._idx_gradient[i] = ()
 
+        # shapes of the packed symmetric diagonal blocks of the hessian
+        self._idx_packed = []
+
         for i in range(len(self._idx_gradient)):
             a = self._idx_gradient[i]
 
@@ -156,55 +324,418 @@ class Material(Function):
                 b = self._idx_gradient[j]
 
                 if triu and j >= i or not triu:
-                    self._idx_hessian.append((*a, *b))
+                    size = self.x[i].numel()
+
+                    if packed and i == j and size > 1:
+                        self._idx_hessian.append((size * (size + 1) // 2,))
+                        self._idx_packed.append(a)
+                    else:
+                        self._idx_hessian.append((*a, *b))
+                        self._idx_packed.append(None)
+
+        # casADi function objects of the derivatives are generated on first access
+        self._options = (triu, statevars, packed)
+        self._fused = {}
+        self._blocks = {}
+        self._setup(compiled, cache, prewarm)
+
+    def _generate(self, name):
+        "Generate the casADi function object of a derivative."
+        methods = [m for m, a in self._functions.items() if a == name]
+        return self._combine(methods)
+
+    def _expressions(self, methods):
+        """Return a dict with the lists of symbolic outputs of the given methods. The
+        hessian reuses the symbolic gradient and the hessian-vector-products reuse the
+        gradient-vector-products."""
+
+        triu, statevars, packed = self._options
+
+        # active variables and vectors of the vector-products
+        n = len(self.x) - statevars
+        x, v, u = self.x[:n], self.v[:n], self.u[:n]
+        f = self._f[0]
+
+        expressions = {"function": self._f}
+
+        if "hessian" in methods:
+            hessians, gradients = zip(*[ca.hessian(f, y) for y in x])
+            expressions["hessian"] = []
+
+            # generate upper-triangle of hessian
+            for i, (h, g) in enumerate(zip(hessians, gradients)):
+                for j, z in enumerate(x):
+                    if triu and j >= i or not triu:
+                        if packed and i == j and h.numel() > 1:
+                            # independent entries of the major-symmetric block
+                            h = ca.vertcat(*packed_entries(h))
+
+                        expressions["hessian"].append(
+                            h if i == j else ca.jacobian(g, z)
+                        )
+
+            expressions["gradient"] = list(gradients)
+
+        elif "gradient" in methods:
+            expressions["gradient"] = [ca.gradient(f, y) for y in x]
+
+        if "sensitivity" in methods:
+            if "gradient" not in expressions:
+                expressions["gradient"] = [ca.gradient(f, y) for y in x]
+
+            # derivatives of the function and the gradients w.r.t. the parameters
+            expressions["sensitivity"] = [
+                ca.jacobian(e, p)
+                for e in [f, *expressions["gradient"]]
+                for p in self._p
+            ]
+
+        if "gradient_vector_product" in methods or "hessian_vector_product" in methods:
+            gvp = [ca.jtimes(f, y, w) for y, w in zip(x, v)]
+            expressions["gradient_vector_product"] = gvp
+
+        if "hessian_vector_product" in methods:
+            expressions["hessian_vector_product"] = []
+
+            # generate upper-triangle of hessian-vector-products
+            for i, g in enumerate(gvp):
+                for j, (z, q) in enumerate(zip(x, u)):
+                    if triu and j >= i or not triu:
+                        expressions["hessian_vector_product"].append(ca.jtimes(g, z, q))
+
+        return expressions
 
-    def gradient(self, x, threads=cpu_count()):
+    def _combine(self, methods):
+        "Generate one casADi function object with the outputs of the given methods."
+
+        expressions = self._expressions(methods)
+        names = {
+            "function": "f",
+            "gradient": "g",
+            "hessian": "h",
+            "gradient_vector_product": "gvp",
+            "hessian_vector_product": "hvp",
+            "sensitivity": "s",
+        }
+
+        inputs = [*self.x]
+
+        if "gradient_vector_product" in methods or "hessian_vector_product" in methods:
+            inputs += self.v
+
+        if "hessian_vector_product" in methods:
+            inputs += self.u
+
+        inputs += self._p
+
+        return ca.Function(
+            "_".join(names[m] for m in methods),
+            inputs,
+            [y for m in methods for y in expressions[m]],
+        )
+
+    def _shapes(self, method):
+        "Return the list of output shapes of a method."
+        return {
+            "function": self._idx_function,
+            "gradient": self._idx_gradient,
+            "hessian": self._idx_hessian,
+            "gradient_vector_product": self._idx_function * len(self._idx_gradient),
+            "hessian_vector_product": self._idx_function * len(self._idx_hessian),
+            "sensitivity": [
+                (*e, *p.shape)
+                for e in [*self._idx_function, *self._idx_gradient]
+                for p in self._p
+            ],
+        }[method]
+
+    def evaluate(
+        self,
+        x,
+        outputs=("function", "gradient", "hessian"),
+        v=None,
+        u=None,
+        threads=cpu_count(),
+        out=None,
+        chunksize=None,
+        nonzeros=False,
+        parameters=None,
+    ):
+        """Return the lists of results of the given methods, evaluated by one combined
+        casADi function in a single pass over the points."""
+
+        outputs = tuple(outputs)
+
+        for method in outputs:
+            if method not in self._functions:
+                raise ValueError(f"Unknown output `{method}`.")
+
+        # generate the combined casADi function object on first access
+        if outputs not in self._fused:
+            self._fused[outputs] = self._build(outputs, self._combine, outputs)
+
+        # inputs of the combined function
+        args = [*x]
+
+        if "gradient_vector_product" in outputs or "hessian_vector_product" in outputs:
+            args += v
+
+        if "hessian_vector_product" in outputs:
+            args += u
+
+        args += self._values(parameters)
+
+        shapes = [self._shapes(method) for method in outputs]
+
+        if out is not None:
+            out = [o for a, s in zip(out, shapes) for o in (a or [None] * len(s))]
+
+        res = apply(
+            args,
+            fun=self._fused[outputs],
+            x_shape=self._idx_gradient,
+            fun_shape=[shape for s in shapes for shape in s],
+            threads=threads,
+            out=out,
+            chunksize=chunksize,
+            nonzeros=nonzeros,
+            stats=self.stats,
+            method="evaluate",
+        )
+
+        # split the results into the lists of the methods
+        a = np.cumsum([0, *[len(s) for s in shapes]])
+        return [res[start:stop] for start, stop in zip(a[:-1], a[1:])]
+
+    def gradient(
+        self,
+        x,
+        threads=cpu_count(),
+        out=None,
+        chunksize=None,
+        nonzeros=False,
+        parameters=None,
+    ):
         "Return list of gradients."
         return apply(
-            x,
+            [*x, *self._values(parameters)],
             fun=self._gradient,
             x_shape=self._idx_gradient,
             fun_shape=self._idx_gradient,
             threads=threads,
+            out=out,
+            chunksize=chunksize,
+            nonzeros=nonzeros,
+            stats=self.stats,
+            method="gradient",
         )
 
-    def hessian(self, x, threads=cpu_count()):
+    def hessian(
+        self,
+        x,
+        threads=cpu_count(),
+        out=None,
+        chunksize=None,
+        nonzeros=False,
+        parameters=None,
+    ):
         "Return upper-triangle entries of hessian."
         return apply(
-            x,
+            [*x, *self._values(parameters)],
             fun=self._hessian,
             x_shape=self._idx_gradient,
             fun_shape=self._idx_hessian,
             threads=threads,
+            out=out,
+            chunksize=chunksize,
+            nonzeros=nonzeros,
+            stats=self.stats,
+            method="hessian",
         )
 
-    def gradient_vector_product(self, x, v, threads=cpu_count()):
+    def unpack(self, hessian):
+        """Return the list of hessian blocks with lazy unpacking views of the packed
+        symmetric diagonal blocks."""
+        return [
+            h if shape is None else PackedSymmetric(h, shape)
+            for h, shape in zip(hessian, self._idx_packed)
+        ]
+
+    def gradient_vector_product(
+        self,
+        x,
+        v,
+        threads=cpu_count(),
+        out=None,
+        chunksize=None,
+        nonzeros=False,
+        parameters=None,
+    ):
         "Return list of gradient-vector-products."
         return apply(
-            [*x, *v],
+            [*x, *v, *self._values(parameters)],
             fun=self._gradient_vector_product,
             x_shape=self._idx_gradient,
-            fun_shape=self._idx_function * len(self._gvp),
+            fun_shape=self._idx_function * self._gradient_vector_product.n_out(),
             threads=threads,
+            out=out,
+            chunksize=chunksize,
+            nonzeros=nonzeros,
+            stats=self.stats,
+            method="gradient_vector_product",
         )
 
-    def hessian_vector_product(self, x, v, u, threads=cpu_count()):
+    def hessian_vector_product(
+        self,
+        x,
+        v,
+        u,
+        threads=cpu_count(),
+        out=None,
+        chunksize=None,
+        nonzeros=False,
+        parameters=None,
+    ):
         "Return list of hessian-vector-products."
         return apply(
-            [*x, *v, *u],
+            [*x, *v, *u, *self._values(parameters)],
             fun=self._hessian_vector_product,
             x_shape=self._idx_gradient,
-            fun_shape=self._idx_function * len(self._hvp),
+            fun_shape=self._idx_function * self._hessian_vector_product.n_out(),
+            threads=threads,
+            out=out,
+            chunksize=chunksize,
+            nonzeros=nonzeros,
+            stats=self.stats,
+            method="hessian_vector_product",
+        )
+
+    def sensitivity(
+        self,
+        x,
+        threads=cpu_count(),
+        out=None,
+        chunksize=None,
+        nonzeros=False,
+        parameters=None,
+    ):
+        """Return list of the derivatives of the function and of the gradients w.r.t.
+        the symbolic parameters, i.e. `[dW/dp_1, ..., dW/dp_m, dP_1/dp_1, ...]`."""
+        return apply(
+            [*x, *self._values(parameters)],
+            fun=self._sensitivity,
+            x_shape=self._idx_gradient,
+            fun_shape=self._shapes("sensitivity"),
+            threads=threads,
+            out=out,
+            chunksize=chunksize,
+            nonzeros=nonzeros,
+            stats=self.stats,
+            method="sensitivity",
+        )
+
+    def _block(self, k):
+        """Generate the casADi function object of the hessian-vector-products for `k`
+        pairs of directions, which share the evaluation at the linearization point."""
+
+        triu, statevars, packed = self._options
+
+        # active variables
+        n = len(self.x) - statevars
+        x = self.x[:n]
+
+        # directions of the active variables, stacked as columns
+        V = [Variable("V%d" % a, y.numel(), k) for a, y in enumerate(x)]
+        U = [Variable("U%d" % a, y.numel(), k) for a, y in enumerate(x)]
+
+        def column(W, a, b):
+            return ca.reshape(W[a][:, b], *x[a].shape)
+
+        hvp = []
+
+        # generate upper-triangle of hessian-vector-products
+        for i, y in enumerate(x):
+            gvp = [ca.jtimes(self._f[0], y, column(V, i, b)) for b in range(k)]
+
+            for j, z in enumerate(x):
+                if triu and j >= i or not triu:
+                    hvp.append(
+                        ca.horzcat(
+                            *[
+                                ca.jtimes(g, z, column(U, j, b))
+                                for b, g in enumerate(gvp)
+                            ]
+                        )
+                    )
+
+        return ca.Function("hvp%d" % k, [*self.x, *V, *U, *self._p], hvp)
+
+    def hessian_vector_product_block(
+        self,
+        x,
+        v,
+        u,
+        threads=cpu_count(),
+        out=None,
+        chunksize=None,
+        nonzeros=False,
+        parameters=None,
+    ):
+        """Return list of hessian-vector-products for a block of `k` directions. The
+        directions are stacked along a new axis between the axes of a variable and the
+        trailing axes, e.g. `(3, 3, k, ...)` for the deformation gradient."""
+
+        k = np.shape(v[0])[len(self._idx_gradient[0])]
+
+        # generate the casADi function object on first access
+        if k not in self._blocks:
+            self._blocks[k] = self._build(("hvp", k), self._block, k)
+
+        return apply(
+            [*x, *v, *u, *self._values(parameters)],
+            fun=self._blocks[k],
+            x_shape=self._idx_gradient,
+            fun_shape=[(*f, k) for f in self._idx_function] * self._blocks[k].n_out(),
             threads=threads,
+            out=out,
+            chunksize=chunksize,
+            nonzeros=nonzeros,
+            stats=self.stats,
+            method="hessian_vector_product_block",
         )
 
 
 class MaterialTensor(FunctionTensor):
+    _functions = {
+        "function": "_function",
+        "gradient": "_function",
+        "hessian": "_gradient",
+        "gradient_vector_product": "_gradient_vector_product",
+    }
+
     def __init__(
-        self, x, fun, args=(), kwargs={}, compress=False, triu=True, statevars=0
+        self,
+        x,
+        fun,
+        args=(),
+        kwargs={},
+        compress=False,
+        triu=True,
+        statevars=0,
+        compiled=None,
+        cache=None,
+        prewarm=(),
+        parameters=(),
     ):
         # init Function
-        super().__init__(x=x, fun=fun, args=args, kwargs=kwargs)
+        super().__init__(
+            x=x,
+            fun=fun,
+            args=args,
+            kwargs=kwargs,
+            compiled=False,
+            parameters=parameters,
+        )
         self.gradient = self.function
 
         # no. of active variables
@@ -213,32 +744,6 @@ class MaterialTensor(FunctionTensor):
         # generate vector for gradient-vector-product
         self.v = [Variable("v%d" % a, *x.shape) for a, x in enumerate(self.x)]
 
-        # generate gradient and gradient-vector-product
-        self._g = [ca.jacobian(f, x) for x in self.x[:n] for f in self._f[:n]]
-        self._gvp = [
-            ca.jtimes(f, x, v)
-            for x, v in zip(self.x[:n], self.v[:n])
-            for f in self._f[:n]
-        ]
-
-        # store only upper-triangle entries of gradients
-        if triu:
-            i, j = np.triu_indices(len(self.x[:n]))
-            a = (
-                np.arange(len(self.x[:n]) ** 2)
-                .reshape(len(self.x[:n]), len(self.x[:n]))[i, j]
-                .ravel()
-            )
-            self._g = [self._g[b] for b in a]
-            self._gvp = [self._gvp[b] for b in a]
-
-        # generate casADi function objects
-        self._function = ca.Function("f", self.x, self._f)
-        self._gradient = ca.Function("g", self.x, self._g)
-        self._gradient_vector_product = ca.Function(
-            "gvp", [*self.x, *self.v], self._gvp
-        )
-
         # generate indices
         self._idx_gradient = []
 
@@ -260,22 +765,91 @@ class MaterialTensor(FunctionTensor):
                 else:
                     self._idx_gradient.append((*a, *b))
 
-    def hessian(self, x, threads=cpu_count()):
+        # casADi function objects of the derivatives are generated on first access
+        self._options = (triu, statevars)
+        self._setup(compiled, cache, prewarm)
+
+    def _generate(self, name):
+        "Generate the casADi function object of a gradient."
+
+        triu, statevars = self._options
+
+        # active variables and vectors of the vector-products
+        n = len(self.x) - statevars
+        x, v = self.x[:n], self.v[:n]
+
+        if name == "_gradient":
+            g = [ca.jacobian(f, y) for y in x for f in self._f[:n]]
+            g = self._upper(g, triu, n)
+            return ca.Function("g", [*self.x, *self._p], g)
+
+        if name == "_gradient_vector_product":
+            gvp = [ca.jtimes(f, y, w) for y, w in zip(x, v) for f in self._f[:n]]
+            gvp = self._upper(gvp, triu, n)
+            return ca.Function("gvp", [*self.x, *self.v, *self._p], gvp)
+
+    def _upper(self, gradients, triu, n):
+        "Return only upper-triangle entries of gradients (if triu)."
+
+        if triu:
+            i, j = np.triu_indices(n)
+            a = np.arange(n**2).reshape(n, n)[i, j].ravel()
+            gradients = [gradients[b] for b in a]
+
+        return gradients
+
+    def _shapes(self, method):
+        "Return the list of output shapes of a method."
+        return {
+            "function": self._idx_function,
+            "gradient": self._idx_function,
+            "hessian": self._idx_gradient,
+            "gradient_vector_product": self._idx_function
+            * self._gradient_vector_product.n_out(),
+        }[method]
+
+    def hessian(
+        self,
+        x,
+        threads=cpu_count(),
+        out=None,
+        chunksize=None,
+        nonzeros=False,
+        parameters=None,
+    ):
         "Return list of gradients."
         return apply(
-            x,
+            [*x, *self._values(parameters)],
             fun=self._gradient,
             x_shape=self._idx_x,
             fun_shape=self._idx_gradient,
             threads=threads,
+            out=out,
+            chunksize=chunksize,
+            nonzeros=nonzeros,
+            stats=self.stats,
+            method="hessian",
         )
 
-    def gradient_vector_product(self, x, threads=cpu_count()):
+    def gradient_vector_product(
+        self,
+        x,
+        threads=cpu_count(),
+        out=None,
+        chunksize=None,
+        nonzeros=False,
+        parameters=None,
+    ):
         "Return list of gradient-vector-products."
         return apply(
-            x,
+            [*x, *self._values(parameters)],
             fun=self._gradient_vector_product,
             x_shape=self._idx_x,
-            fun_shape=self._idx_function * len(self._gvp),
+            fun_shape=self._idx_function * self._gradient_vector_product.n_out(),
             threads=threads,
+            out=out,
+            chunksize=chunksize,
+            nonzeros=nonzeros,
+            stats=self.stats,
+            method="gradient_vector_product",
         )
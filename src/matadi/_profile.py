@@ -0,0 +1,132 @@
+import json
+import os
+from collections import namedtuple
+from threading import Lock, get_ident
+
+MethodStats = namedtuple(
+    "MethodStats",
+    "calls points time tune map evaluate reshape bytes",
+    defaults=[0] * 8,
+)
+
+
+class Stats:
+    """Profiling statistics of the evaluation methods of a function. For each method,
+    the number of calls and points, the wall time (split into the autotuning, the
+    construction of mapped functions, the evaluation and the NumPy reshaping) and the
+    bytes of newly allocated output arrays (without given `out` arrays and reused
+    pooled arrays) are recorded. An optional callback is called with a dict of each
+    evaluation and the evaluations may be exported as a Chrome trace."""
+
+    def __init__(self, callback=None, trace=False):
+        self.callback = callback
+        self.methods = {}
+        self.events = [] if trace else None
+        self._lock = Lock()
+
+    def __getitem__(self, method):
+        return self.methods.get(method, MethodStats())
+
+    def __repr__(self):
+        header = "%-32s %8s %12s %10s %10s %10s %10s %10s %12s" % (
+            "method",
+            *MethodStats._fields,
+        )
+        lines = [
+            "%-32s %8d %12d %10.4f %10.4f %10.4f %10.4f %10.4f %12d" % (method, *s)
+            for method, s in self.methods.items()
+        ]
+        return "\n".join([header, *lines])
+
+    def record(self, method, points, start, time, map, evaluate, nbytes, tune=0.0):
+        """Record an evaluation of a method, started at `start` (in seconds). The time
+        `tune` is spent on the autotuning of the other candidates."""
+
+        reshape = max(0.0, time - tune - map - evaluate)
+
+        with self._lock:
+            s = self[method]
+            self.methods[method] = MethodStats(
+                s.calls + 1,
+                s.points + points,
+                s.time + time,
+                s.tune + tune,
+                s.map + map,
+                s.evaluate + evaluate,
+                s.reshape + reshape,
+                s.bytes + nbytes,
+            )
+
+            event = {
+                "method": method,
+                "points": points,
+                "start": start,
+                "time": time,
+                "tune": tune,
+                "map": map,
+                "evaluate": evaluate,
+                "reshape": reshape,
+                "bytes": nbytes,
+                "thread": get_ident(),
+            }
+
+            if self.events is not None:
+                self.events.append(event)
+
+        if self.callback is not None:
+            self.callback(event)
+
+    def reset(self):
+        "Reset all statistics and recorded events."
+        with self._lock:
+            self.methods.clear()
+
+            if self.events is not None:
+                self.events.clear()
+
+    def export_trace(self, path):
+        """Export the recorded events as a Chrome trace (JSON), which may be opened by
+        `chrome://tracing` or Perfetto. Requires `Stats(trace=True)`."""
+
+        if self.events is None:
+            raise ValueError("Events are only recorded with `trace=True`.")
+
+        pid = os.getpid()
+        events = []
+
+        # one event per evaluation with its phases (summed over all chunks) in sequence
+        for e in self.events:
+            start = e["start"] * 1e6
+            args = {key: e[key] for key in ["points", "bytes"]}
+            events.append(
+                {
+                    "name": e["method"],
+                    "cat": "matadi",
+                    "ph": "X",
+                    "ts": start,
+                    "dur": e["time"] * 1e6,
+                    "pid": pid,
+                    "tid": e["thread"],
+                    "args": args,
+                }
+            )
+
+            for phase in ["tune", "map", "evaluate", "reshape"]:
+                if phase == "tune" and not e[phase]:
+                    continue
+
+                events.append(
+                    {
+                        "name": phase,
+                        "cat": "matadi",
+                        "ph": "X",
+                        "ts": start,
+                        "dur": e[phase] * 1e6,
+                        "pid": pid,
+                        "tid": e["thread"],
+                    }
+                )
+                start += e[phase] * 1e6
+
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
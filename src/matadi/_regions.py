@@ -0,0 +1,152 @@
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import cpu_count
+
+import numpy as np
+
+
+class MaterialRegions:
+    """Multi-material evaluation on regions of points. A region index (the index of
+    the material in the list of materials) is given for each point, i.e. the array of
+    region indices has the shape of the trailing axes of the inputs. All regions are
+    evaluated concurrently and the results are written into shared output arrays.
+
+    If the region index is constant along all but the last trailing axis (e.g. one
+    material per cell), contiguous runs of cells are evaluated on views of the inputs
+    and outputs without copies. Otherwise, the points of each region are gathered.
+
+    The number of `threads` of an evaluation (default is the number of CPUs) is split
+    between the concurrently evaluated groups of points. Per-point values of symbolic
+    `parameters` are evaluated on the points of each group."""
+
+    def __init__(self, materials, regions, workers=None):
+        self.materials = materials
+        self.regions = np.asarray(regions)
+        self.workers = workers
+
+        # shapes of the output blocks, keyed by method, options and input shapes
+        self._shapes = {}
+
+        # get number of variables defined in the first material
+        self._n = len(self.materials[0].x)
+
+        cells = self.regions.reshape(-1, self.regions.shape[-1], order="F")
+
+        if np.all(cells == cells[0]):
+            # contiguous runs of cells with the same region
+            cells = cells[0]
+            edges = [0, *(np.flatnonzero(np.diff(cells)) + 1), len(cells)]
+            self._runs = [
+                (cells[a], slice(a, b)) for a, b in zip(edges[:-1], edges[1:])
+            ]
+            self._points = None
+        else:
+            # flat indices of the points of each region
+            flat = self.regions.ravel(order="F")
+            self._runs = None
+            self._points = [
+                (m, np.flatnonzero(flat == m))
+                for m in range(len(self.materials))
+                if np.any(flat == m)
+            ]
+
+    def _evaluate(self, method, x, out=None, **kwargs):
+        "Evaluate a method of all materials on their regions of points."
+
+        x = [np.asarray(z) for z in x[: self._n]]
+        ax = self.regions.shape
+        k = len(ax)
+
+        # values of the symbolic parameters, either scalars or arrays of the points
+        parameters = {
+            name: np.asarray(value)
+            for name, value in (kwargs.pop("parameters", None) or {}).items()
+        }
+
+        def select(points, gather=False):
+            "Return the parameters of a group of points."
+
+            values = {}
+
+            for name, value in parameters.items():
+                if value.shape[max(0, value.ndim - k) :] != ax:
+                    values[name] = value
+                elif gather:
+                    flat = value.reshape(*value.shape[:-k], -1, order="F")
+                    values[name] = flat[..., points]
+                else:
+                    values[name] = value[..., points]
+
+            return {"parameters": values} if parameters else {}
+
+        # shapes of the output blocks by an evaluation on the first point (cached)
+        nonzeros = kwargs.get("nonzeros", False)
+        key = (method, nonzeros, tuple(z.shape[:-k] for z in x))
+
+        if key not in self._shapes:
+            first = self._runs[0][0] if self._runs else self._points[0][0]
+            probe = getattr(self.materials[first], method)(
+                [z[(..., *[slice(0, 1)] * k)] for z in x],
+                threads=1,
+                nonzeros=nonzeros,
+            )
+            self._shapes[key] = [None if p is None else p.shape[:-k] for p in probe]
+
+        shapes = self._shapes[key]
+
+        if out is None:
+            out = []
+
+        res = []
+
+        for o, shape in zip([*out, *[None] * len(shapes)], shapes):
+            if o is None and shape is not None:
+                o = np.empty((*shape, *ax), order="F")
+
+            if o is not None and not o.flags.f_contiguous:
+                raise ValueError("Output arrays must be Fortran-contiguous.")
+
+            res.append(o)
+
+        def run(job):
+            m, points = job
+            material = self.materials[m]
+
+            if self._runs is not None:
+                # views of the inputs and outputs for a run of cells
+                y = [z[..., points] for z in x]
+                o = [None if r is None else r[..., points] for r in res]
+                getattr(material, method)(y, out=o, **kwargs, **select(points))
+
+            else:
+                # gather the inputs and scatter the results of the points
+                y = [z.reshape(*z.shape[:-k], -1, order="F")[..., points] for z in x]
+                results = getattr(material, method)(
+                    y, **kwargs, **select(points, gather=True)
+                )
+
+                for r, result in zip(res, results):
+                    if r is not None:
+                        r.reshape(*r.shape[:-k], -1, order="F")[..., points] = result
+
+        jobs = self._runs if self._runs is not None else self._points
+        workers = self.workers or min(32, cpu_count() + 4)
+
+        # split the threads between the concurrently evaluated groups of points
+        threads = kwargs.get("threads", cpu_count())
+
+        if threads != "auto":
+            kwargs["threads"] = max(1, threads // min(workers, len(jobs)))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(run, jobs))
+
+        return res
+
+    def function(self, x, out=None, **kwargs):
+        return self._evaluate("function", x, out=out, **kwargs)
+
+    def gradient(self, x, out=None, **kwargs):
+        return self._evaluate("gradient", x, out=out, **kwargs)
+
+    def hessian(self, x, out=None, **kwargs):
+        return self._evaluate("hessian", x, out=out, **kwargs)
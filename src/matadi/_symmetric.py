@@ -0,0 +1,57 @@
+import numpy as np
+
+
+def packed_index(n):
+    """Return the map of the entries of a symmetric (n, n)-matrix to the packed array
+    of its upper-triangle entries, given in column-major order."""
+
+    row, col = np.meshgrid(np.arange(n), np.arange(n), indexing="ij")
+    lower, upper = np.minimum(row, col), np.maximum(row, col)
+
+    return upper * (upper + 1) // 2 + lower
+
+
+def packed_entries(h):
+    "Return the upper-triangle entries of a symmetric casADi matrix, column-major."
+    n = h.shape[0]
+    return [h[i, j] for j in range(n) for i in range(j + 1)]
+
+
+class PackedSymmetric:
+    """A lazy unpacking view of a major-symmetric block of a hessian, which is stored
+    as a packed array of its upper-triangle entries. Entries are only unpacked on
+    indexing or on the conversion to an array."""
+
+    def __init__(self, packed, shape):
+        self.packed = packed
+        self.index = packed_index(int(np.prod(shape))).reshape(
+            *shape, *shape, order="F"
+        )
+        self.shape = (*self.index.shape, *packed.shape[1:])
+        self.ndim = len(self.shape)
+        self.dtype = packed.dtype
+
+    def unpack(self):
+        "Return the unpacked array."
+        return self.packed[self.index]
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.unpack()
+
+        if dtype is not None:
+            array = array.astype(dtype)
+
+        return array
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+
+        if any(k is Ellipsis or k is None for k in key):
+            return self.unpack()[key]
+
+        # unpack only the entries of the indexed part of the block
+        m = self.index.ndim
+        index = self.index[key[:m]]
+
+        return self.packed[index][(slice(None),) * np.ndim(index) + key[m:]]
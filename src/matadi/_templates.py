@@ -1,10 +1,12 @@
+from functools import partial
+
 import numpy as np
 
 from ._material import Material, MaterialTensor
 from ._variable import Variable
-from .math import Function, det, eye
+from .math import det, diagcat, eye
 from .math import gradient as grad
-from .math import horzcat, trace, vertcat, zeros
+from .math import substitute, trace
 
 
 class TwoFieldVariation:
@@ -35,6 +37,10 @@ class TwoFieldVariation:
     def hessian(self, x, *args, **kwargs):
         return self.W.hessian(x[:2], *args, **kwargs)
 
+    def evaluate(self, x, outputs=("function", "gradient", "hessian"), **kwargs):
+        res = self.W.evaluate(x[:2], outputs, **kwargs)
+        return [[*r, None] if m == "gradient" else r for m, r in zip(outputs, res)]
+
 
 class TwoFieldVariationPlaneStrain:
     def __init__(self, material):
@@ -47,21 +53,21 @@ class TwoFieldVariationPlaneStrain:
 
     def _fun(self, x):
         F, p = x[:2]
-        F = horzcat(vertcat(x[0], zeros(1, 2)), zeros(3, 1))
-        F[2, 2] = 1  # fixed thickness ratio `h / H = 1`
+        F = diagcat(x[0], 1)  # fixed thickness ratio `h / H = 1`
         J = det(F)
         W = self.material.fun(F, **self.material.kwargs)
         U = self.material.fun(J ** (1 / 3) * eye(3), **self.material.kwargs)
 
-        f = Variable("f", 3, 3)
+        # derivatives w.r.t. a symbolic block-diagonal deformation gradient, inlined
+        # by a substitution of the plane strain deformation gradient (one flat graph)
+        f = diagcat(Variable("f", 2, 2), Variable("f33", 1, 1))
         w = self.material.fun(f, **self.material.kwargs)
 
         dwdf = grad(w, f)
         dwdj = trace(dwdf @ f.T) / det(f) / 3
         d2wdjdj = trace(grad(dwdj, f) @ f.T) / det(f) / 3
 
-        dWdJ = Function("w", [f], [dwdj])(F)
-        d2WdJdJ = Function("w", [f], [d2wdjdj])(F)
+        dWdJ, d2WdJdJ = substitute([dwdj, d2wdjdj], [f], [F])
 
         return W - U + 1 / d2WdJdJ * (p * dWdJ - p**2 / 2)
 
@@ -74,6 +80,10 @@ class TwoFieldVariationPlaneStrain:
     def hessian(self, x, *args, **kwargs):
         return self.W.hessian(x[:2], *args, **kwargs)
 
+    def evaluate(self, x, outputs=("function", "gradient", "hessian"), **kwargs):
+        res = self.W.evaluate(x[:2], outputs, **kwargs)
+        return [[*r, None] if m == "gradient" else r for m, r in zip(outputs, res)]
+
 
 class ThreeFieldVariation:
     def __init__(self, material):
@@ -100,6 +110,10 @@ class ThreeFieldVariation:
     def hessian(self, x, *args, **kwargs):
         return self.W.hessian(x[:3], *args, **kwargs)
 
+    def evaluate(self, x, outputs=("function", "gradient", "hessian"), **kwargs):
+        res = self.W.evaluate(x[:3], outputs, **kwargs)
+        return [[*r, None] if m == "gradient" else r for m, r in zip(outputs, res)]
+
 
 class ThreeFieldVariationPlaneStrain:
     def __init__(self, material):
@@ -113,8 +127,7 @@ class ThreeFieldVariationPlaneStrain:
 
     def _fun(self, x):
         F, p, J = x[:3]
-        F = horzcat(vertcat(x[0], zeros(1, 2)), zeros(3, 1))
-        F[2, 2] = 1  # fixed thickness ratio `h / H = 1`
+        F = diagcat(x[0], 1)  # fixed thickness ratio `h / H = 1`
         detF = det(F)
         Fmod = (J / detF) ** (1 / 3) * F
         return self.material.fun(Fmod, **self.material.kwargs) + p * (detF - J)
@@ -128,16 +141,29 @@ class ThreeFieldVariationPlaneStrain:
     def hessian(self, x, *args, **kwargs):
         return self.W.hessian(x[:3], *args, **kwargs)
 
+    def evaluate(self, x, outputs=("function", "gradient", "hessian"), **kwargs):
+        res = self.W.evaluate(x[:3], outputs, **kwargs)
+        return [[*r, None] if m == "gradient" else r for m, r in zip(outputs, res)]
+
 
 class MaterialHyperelastic:
-    def __init__(self, fun, **kwargs):
+    def __init__(self, fun, parameters=(), **kwargs):
         F = Variable("F", 3, 3)
         self.x = [F]
         self.fun = fun
         self.kwargs = kwargs
-        self.W = Material(self.x, self._fun_wrapper, kwargs=self.kwargs)
+        self.W = Material(
+            self.x, self._fun_wrapper, kwargs=self.kwargs, parameters=parameters
+        )
         self.gradient_vector_product = self.W.gradient_vector_product
         self.hessian_vector_product = self.W.hessian_vector_product
+        self.sensitivity = self.W.sensitivity
+
+    def __reduce__(self):
+        """Pickle the material by its strain energy function, the names of the
+        symbolic parameters and the keyword arguments."""
+        parameters = list(self.W._parameters)
+        return partial(type(self), self.fun, parameters, **self.kwargs), ()
 
     def _fun_wrapper(self, x, **kwargs):
         return self.fun(x[0], **kwargs)
@@ -151,20 +177,34 @@ class MaterialHyperelastic:
     def hessian(self, x, *args, **kwargs):
         return self.W.hessian(x[:1], *args, **kwargs)
 
+    def evaluate(self, x, outputs=("function", "gradient", "hessian"), **kwargs):
+        res = self.W.evaluate(x[:1], outputs, **kwargs)
+        return [[*r, None] if m == "gradient" else r for m, r in zip(outputs, res)]
+
 
 class MaterialHyperelasticPlaneStrain:
-    def __init__(self, fun, **kwargs):
+    def __init__(self, fun, parameters=(), **kwargs):
         F = Variable("F", 2, 2)
         self.x = [F]
         self.fun = fun
         self.kwargs = kwargs
-        self.W = Material(self.x, self._fun_wrapper, kwargs=self.kwargs)
+        self.W = Material(
+            self.x, self._fun_wrapper, kwargs=self.kwargs, parameters=parameters
+        )
         self.gradient_vector_product = self.W.gradient_vector_product
         self.hessian_vector_product = self.W.hessian_vector_product
+        self.sensitivity = self.W.sensitivity
+
+    def __reduce__(self):
+        """Pickle the material by its strain energy function, the names of the
+        symbolic parameters and the keyword arguments."""
+        parameters = list(self.W._parameters)
+        return partial(type(self), self.fun, parameters, **self.kwargs), ()
 
     def _fun_wrapper(self, x, **kwargs):
-        F = horzcat(vertcat(x[0], zeros(1, 2)), zeros(3, 1))
-        F[2, 2] = 1  # fixed thickness ratio `h / H = 1`
+        # block-diagonal deformation gradient with structural zeros, which are
+        # skipped by the (sparse) operations of the strain energy function
+        F = diagcat(x[0], 1)  # fixed thickness ratio `h / H = 1`
         return self.fun(F, **kwargs)
 
     def function(self, x, *args, **kwargs):
@@ -176,59 +216,125 @@ class MaterialHyperelasticPlaneStrain:
     def hessian(self, x, *args, **kwargs):
         return self.W.hessian(x[:1], *args, **kwargs)
 
+    def evaluate(self, x, outputs=("function", "gradient", "hessian"), **kwargs):
+        res = self.W.evaluate(x[:1], outputs, **kwargs)
+        return [[*r, None] if m == "gradient" else r for m, r in zip(outputs, res)]
+
 
 class MaterialHyperelasticPlaneStressIncompressible(MaterialHyperelasticPlaneStrain):
-    def __init__(self, fun, **kwargs):
-        super().__init__(fun, **kwargs)
+    def __init__(self, fun, parameters=(), **kwargs):
+        super().__init__(fun, parameters=parameters, **kwargs)
 
     def _fun_wrapper(self, x, **kwargs):
-        F = horzcat(vertcat(x[0], zeros(1, 2)), zeros(3, 1))
-        F[2, 2] = 1 / det(x[0])  # thickness ratio `h / H = 1 / (a / A)`
+        F = diagcat(x[0], 1 / det(x[0]))  # thickness ratio `h / H = 1 / (a / A)`
         return self.fun(F, **kwargs)
 
 
 class MaterialHyperelasticPlaneStressLinearElastic(MaterialHyperelasticPlaneStrain):
-    def __init__(self, fun, **kwargs):
-        super().__init__(fun, **kwargs)
+    def __init__(self, fun, parameters=(), **kwargs):
+        super().__init__(fun, parameters=parameters, **kwargs)
 
     def _fun_wrapper(self, x, **kwargs):
-        F = horzcat(vertcat(x[0], zeros(1, 2)), zeros(3, 1))
         # stress-free thickness ratio for linear elastic material
         # s_33 != 0 = 2 mu e_33 + lmbda (e_11 + e_22 + e_33)
         # e_33 = - (e_11 + e_22) * lmbda / (2 mu + lmbda)
         # F_33 = 1 + e_33
-        F[2, 2] = 1 - (F[0, 0] + F[1, 1] - 2) * (
+        F33 = 1 - (x[0][0, 0] + x[0][1, 1] - 2) * (
             kwargs["lmbda"] / (2 * kwargs["mu"] + kwargs["lmbda"])
         )
+        F = diagcat(x[0], F33)
         return self.fun(F, **kwargs)
 
 
 class MaterialComposite:
-    "Composite Material as a sum of a list of hyperelastic materials."
+    """Composite Material as a sum of a list of hyperelastic materials. With
+    `fused=True`, the strain energy functions of all materials are summed up
+    symbolically and all methods are evaluated by one material (with optional
+    keyword arguments of `Material`), i.e. in a single pass over the points."""
 
-    def __init__(self, materials):
+    def __init__(self, materials, fused=False, **kwargs):
         self.materials = materials
         self.fun = self.composite
+        self.fused = fused
 
         # get number of variables defined in the first material
         self._n = len(self.materials[0].x)
 
+        if self.fused:
+            for m in self.materials:
+                if getattr(m, "W", m)._parameters:
+                    raise ValueError("Symbolic parameters can't be fused.")
+
+            self.x = self.materials[0].x
+            self.W = Material(self.x, self._fun, **kwargs)
+            self.gradient_vector_product = self.W.gradient_vector_product
+            self.hessian_vector_product = self.W.hessian_vector_product
+
+    def _fun(self, x):
+        "Sum of the strain energy functions of all materials."
+        W = [getattr(m, "W", m) for m in self.materials]
+        return sum([w._fun(x[: len(w.x)], *w.args, **w.kwargs) for w in W])
+
     def composite(self):
         "Dummy function for plot title."
         return
 
-    def function(self, x, **kwargs):
+    def _sum(self, results, out=None):
+        """Sum up the results of all materials (in-place, without stacking the
+        results), optionally into given output arrays."""
+        if out is None:
+            out = []
+
+        sums = []
+
+        for a, o in zip(range(len(results[0])), [*out, *[None] * len(results[0])]):
+            if o is None:
+                o = results[0][a]
+            else:
+                o[...] = results[0][a]
+
+            for r in results[1:]:
+                np.add(o, r[a], out=o)
+
+            sums.append(o)
+
+        return sums
+
+    def function(self, x, out=None, **kwargs):
+        if self.fused:
+            return self.W.function(x[: self._n], out=out, **kwargs)
+
         fun = [m.function(x[: self._n], **kwargs) for m in self.materials]
-        return [np.sum([f[a] for f in fun], 0) for a in range(len(fun[0]))]
+        return self._sum(fun, out=out)
+
+    def gradient(self, x, out=None, **kwargs):
+        if self.fused:
+            return [*self.W.gradient(x[: self._n], out=out, **kwargs), None]
 
-    def gradient(self, x, **kwargs):
         grad = [m.gradient(x[: self._n], **kwargs)[: len(x)] for m in self.materials]
-        res = [np.sum([g[a] for g in grad], 0) for a in range(len(grad[0]))]
-        return [*res, None]
+        return [*self._sum(grad, out=out), None]
+
+    def hessian(self, x, out=None, **kwargs):
+        if self.fused:
+            return self.W.hessian(x[: self._n], out=out, **kwargs)
 
-    def hessian(self, x, **kwargs):
         hess = [m.hessian(x[: self._n], **kwargs) for m in self.materials]
-        return [np.sum([h[a] for h in hess], 0) for a in range(len(hess[0]))]
+        return self._sum(hess, out=out)
+
+    def evaluate(self, x, outputs=("function", "gradient", "hessian"), **kwargs):
+        if self.fused:
+            res = self.W.evaluate(x[: self._n], outputs, **kwargs)
+            return [[*r, None] if m == "gradient" else r for m, r in zip(outputs, res)]
+
+        res = [m.evaluate(x[: self._n], outputs, **kwargs) for m in self.materials]
+        return [
+            (
+                [*self._sum([r[a][: len(x)] for r in res]), None]
+                if method == "gradient"
+                else self._sum([r[a] for r in res])
+            )
+            for a, method in enumerate(outputs)
+        ]
 
 
 class MaterialTensorGeneral(MaterialTensor):
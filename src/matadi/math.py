@@ -18,6 +18,7 @@ from casadi import (
     cross,
     det,
     diag,
+    diagcat,
 )
 from casadi import dot as _dot  # tensor and vector operations; trig; math
 from casadi import (
@@ -53,6 +54,7 @@ from casadi import (
     sin,
     sinh,
     sqrt,
+    substitute,
     sum1,
     sum2,
     sumsqr,
@@ -87,6 +89,7 @@ __all__ = [
     "cross",
     "det",
     "diag",
+    "diagcat",
     "_dot",
     "eig_symbolic",
     "erf",
@@ -120,6 +123,7 @@ __all__ = [
     "sin",
     "sinh",
     "sqrt",
+    "substitute",
     "sum1",
     "sum2",
     "sumsqr",
@@ -163,8 +167,8 @@ def eigvals(T, eps=1e-4):
     """Compute the eigenvalues of a 3x3 matrix, perturbed by a small number ``eps`` on
     the diagonal entries."""
 
-    # perturbation matrix
-    D = DM([[1, 0, 0], [0, -1, 0], [0, 0, 0]])
+    # perturbation matrix (diagonal sparsity, which keeps the block structure of T)
+    D = diag(DM([1, -1, 0]))
 
     return eig_symbolic(T + D * eps)
 
@@ -1,8 +1,17 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 import matplotlib.pyplot as plt
+import numpy as np
 import pytest
 
 import matadi.models as md
-from matadi import Lab, LabCompressible, LabIncompressible, MaterialHyperelastic
+from matadi import (
+    Calibration,
+    Lab,
+    LabCompressible,
+    LabIncompressible,
+    MaterialHyperelastic,
+)
 from matadi.models import extended_tube, mooney_rivlin, neo_hooke, van_der_waals
 
 
@@ -121,5 +130,142 @@ def test_lab():
         del data
 
 
+def test_lab_batched():
+    mat = MaterialHyperelastic(mooney_rivlin, C10=0.3, C01=0.8, bulk=5000.0)
+    lab = LabCompressible(mat)
+    data = lab.run(num=20, stretch_min=0.1)
+
+    # all load cases are solved by a few batched evaluations
+    assert mat.W.stats["evaluate"].calls < 10
+
+    # stress-free lateral directions (in the undeformed configuration)
+    for d in data:
+        F = np.zeros((3, 3, 20))
+        F[0, 0] = d.stretch
+        F[1, 1] = d.stretch_2
+        F[2, 2] = d.stretch_3
+        F[0, 1] = d.shear
+        P = mat.gradient([F])[0]
+
+        assert np.all(d.stretch_2 > 0) and np.all(d.stretch_3 > 0)
+        assert np.allclose(P[2, 2], 0, atol=1e-8)
+
+        if d.label in ["uniaxial", "shear"]:
+            assert np.allclose(P[1, 1], 0, atol=1e-8)
+
+    # one batched evaluation of all load cases and stability checks
+    mat = MaterialHyperelastic(mooney_rivlin, C10=0.3, C01=0.8, bulk=5000.0)
+    lab = LabIncompressible(mat)
+    data = lab.run(num=20)
+
+    assert mat.W.stats["evaluate"].calls == 1
+
+    for d in data[:3]:
+        assert d.stability.dtype == bool
+        assert d.stability.shape == (20,)
+
+
+def test_lab_continuation():
+    # soft compressible material with non-converged points of the Newton iteration
+    mat = MaterialHyperelastic(neo_hooke, C10=0.5, bulk=1.0)
+    lab = LabCompressible(mat)
+
+    labels = ["uniaxial"] * 5 + ["shear"] * 5
+    x = [0.2, 0.3, 0.5, 1.5, 3.0, 0.0, 0.2, 0.5, 1.0, 2.0]
+
+    F, P, A, free, converged = lab._solve(labels, x, continuation=False)
+    assert not np.all(converged)
+
+    for continuation in [None, True]:
+        F, P, A, free, converged = lab._solve(labels, x, continuation=continuation)
+        assert np.all(converged)
+        assert np.allclose(P[1, 1], 0) and np.allclose(P[2, 2], 0)
+
+    data = lab.run(num=10, stretch_min=0.2, stretch_max=3.0, continuation=True)
+    reference = lab.run(num=10, stretch_min=0.2, stretch_max=3.0)
+
+    for d, r in zip(data, reference):
+        assert np.allclose(d.stretch_3, r.stretch_3)
+        assert np.allclose(d.stress, r.stress)
+
+
+def test_lab_executor():
+    mat = MaterialHyperelastic(md.ogden, mu=(1.0, 0.2), alpha=(2.0, -1.5), bulk=5000.0)
+
+    for LabClass in [LabIncompressible, LabCompressible]:
+        lab = LabClass(mat)
+        data = lab.run(num=20)
+
+        for executor in [ThreadPoolExecutor(4), ProcessPoolExecutor(2)]:
+            with executor:
+                for chunksize in [None, 7]:
+                    results = lab.run(num=20, executor=executor, chunksize=chunksize)
+
+                    # same results in the same order
+                    for d, r in zip(data, results):
+                        assert d.label == r.label
+                        assert np.allclose(d.stress, r.stress)
+                        assert np.allclose(d.stretch_2, r.stretch_2)
+                        assert np.allclose(d.stretch_3, r.stretch_3)
+
+
+def test_calibration():
+    for LabClass in [LabIncompressible, LabCompressible]:
+        # synthetic experiments
+        mat = MaterialHyperelastic(mooney_rivlin, C10=0.3, C01=0.8, bulk=5000.0)
+        data = LabClass(mat).run(num=10)
+
+        # batched stresses of the lab are equal to the stresses of the experiments
+        lab = LabClass(
+            MaterialHyperelastic(
+                mooney_rivlin,
+                parameters=["C10", "C01"],
+                C10=0.5,
+                C01=0.5,
+                bulk=5000.0,
+            )
+        )
+        calibration = Calibration(lab, data)
+        assert np.allclose(calibration.residuals([0.3, 0.8]), 0)
+
+        # analytic jacobian vs. finite differences
+        x, h = np.array([0.4, 0.6]), 1e-6
+        r, dr = calibration.residuals(x, jacobian=True)
+        dr_fd = np.stack(
+            [
+                calibration.residuals(x + h * e) - calibration.residuals(x - h * e)
+                for e in np.eye(2)
+            ],
+            axis=1,
+        )
+        assert np.allclose(dr, dr_fd / (2 * h), atol=1e-5)
+
+        result = calibration.fit(bounds=(0, 5), starts=3, seed=0)
+
+        assert len(result.starts) == 3
+        assert np.isclose(result.parameters["C10"], 0.3)
+        assert np.isclose(result.parameters["C01"], 0.8)
+
+    # tuple parameters and experiments as tuples
+    mat = MaterialHyperelastic(md.ogden, mu=(1.0, 0.2), alpha=(2.0, -1.5))
+    data = LabIncompressible(mat).run(ux=True, bx=False, ps=False, shear=True)
+    experiments = [
+        (d.label, d.shear if d.label == "shear" else d.stretch, d.stress) for d in data
+    ]
+
+    mat = MaterialHyperelastic(
+        md.ogden, parameters=["mu"], mu=(0.5, 0.5), alpha=(2.0, -1.5)
+    )
+    result = Calibration(LabIncompressible(mat), experiments).fit()
+    assert np.allclose(result.parameters["mu"], (1.0, 0.2))
+
+    with pytest.raises(ValueError):
+        Calibration(LabIncompressible(MaterialHyperelastic(neo_hooke, C10=0.5)), data)
+
+
 if __name__ == "__main__":
     test_lab()
+    test_lab_batched()
+    test_lab_continuation()
+    test_lab_executor()
+    test_calibration()
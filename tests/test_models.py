@@ -1,4 +1,5 @@
 import numpy as np
+import pytest
 
 import matadi
 import matadi.models as md
@@ -208,6 +209,42 @@ def test_models():
     assert len(P) == 3 + 1
     assert len(A) == 6
 
+    # fused evaluation of all outputs
+    WPA = comp.evaluate([FF, pp, JJ])
+
+    for a, b in zip([W, P, A], WPA):
+        assert len(a) == len(b)
+
+        for y, z in zip(a, b):
+            assert y is z is None or np.allclose(y, z)
+
+    # symbolically fused composite
+    fused = matadi.MaterialComposite([nh_mixed, mr_mixed], fused=True)
+
+    for a, b in zip([W, P, A], fused.evaluate([FF, pp, JJ])):
+        for y, z in zip(a, b):
+            assert y is z is None or np.allclose(y, z)
+
+    for method, res in zip(["function", "gradient", "hessian"], [W, P, A]):
+        for y, z in zip(res, getattr(fused, method)([FF, pp, JJ])):
+            assert y is z is None or np.allclose(y, z)
+
+    fb = matadi.MaterialHyperelastic(md.fiber_family, E=1.0, angle=30, axis=2)
+    comp = matadi.MaterialComposite([nh, mr, fb])
+    fused = matadi.MaterialComposite([nh, mr, fb], fused=True, packed=True)
+
+    assert np.allclose(comp.gradient([FF])[0], fused.gradient([FF])[0])
+    assert np.allclose(comp.hessian([FF])[0], fused.W.unpack(fused.hessian([FF]))[0])
+
+    with pytest.raises(ValueError):
+        matadi.MaterialComposite(
+            [
+                nh,
+                matadi.MaterialHyperelastic(md.neo_hooke, C10=0.5, parameters=["C10"]),
+            ],
+            fused=True,
+        )
+
     nh_mixed2 = matadi.TwoFieldVariation(nh)
     mr_mixed2 = matadi.TwoFieldVariation(mr)
 
@@ -222,5 +259,31 @@ def test_models():
     assert len(A) == 3
 
 
+def test_parameters():
+    # data
+    FF = np.random.rand(3, 3, 5, 100) / 10
+    for a in range(3):
+        FF[a, a] += 1
+
+    # symbolic scalar and tuple parameters of a template
+    HM = matadi.MaterialHyperelastic(
+        md.ogden, mu=(1.0, 0.2), alpha=(2.0, -1.5), bulk=5000.0, parameters=["mu"]
+    )
+    HN = matadi.MaterialHyperelastic(
+        md.ogden, mu=(0.5, 0.1), alpha=(2.0, -1.5), bulk=5000.0
+    )
+
+    mu = np.zeros((2, 5, 100))
+    mu[0], mu[1] = 0.5, 0.1
+
+    assert np.allclose(
+        HM.hessian([FF], parameters={"mu": (0.5, 0.1)})[0], HN.hessian([FF])[0]
+    )
+    assert np.allclose(
+        HM.gradient([FF], parameters={"mu": mu})[0], HN.gradient([FF])[0]
+    )
+
+
 if __name__ == "__main__":
     test_models()
+    test_parameters()
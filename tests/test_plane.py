@@ -1,13 +1,15 @@
 import numpy as np
 
 from matadi import (
+    MaterialHyperelastic,
     MaterialHyperelasticPlaneStrain,
     MaterialHyperelasticPlaneStressIncompressible,
     MaterialHyperelasticPlaneStressLinearElastic,
     ThreeFieldVariationPlaneStrain,
+    TwoFieldVariation,
     TwoFieldVariationPlaneStrain,
 )
-from matadi.models import linear_elastic, neo_hooke
+from matadi.models import linear_elastic, neo_hooke, ogden
 
 
 def pre():
@@ -52,6 +54,32 @@ def test_plane_strain():
     assert DW[0].shape == (2, 2, 2, 2, 8, 1000)
 
 
+def test_plane_strain_3d():
+    # data
+    FF = pre()
+
+    # embed the plane strain deformation gradients
+    FF3 = np.zeros((3, 3, *FF.shape[2:]))
+    FF3[:2, :2] = FF
+    FF3[2, 2] = 1
+
+    kwargs = dict(mu=(1.0, 0.2), alpha=(2.0, -1.5), bulk=50.0)
+    W = MaterialHyperelasticPlaneStrain(fun=ogden, **kwargs)
+    W3 = MaterialHyperelastic(fun=ogden, **kwargs)
+
+    W0 = W.function([FF])
+    dW = W.gradient([FF])
+    DW = W.hessian([FF])
+
+    W03 = W3.function([FF3])
+    dW3 = W3.gradient([FF3])
+    DW3 = W3.hessian([FF3])
+
+    assert np.allclose(W0[0], W03[0])
+    assert np.allclose(dW[0], dW3[0][:2, :2])
+    assert np.allclose(DW[0], DW3[0][:2, :2, :2, :2])
+
+
 def test_plane_strain_mixed():
     # data
     FF, pp, JJ = pre_mixed()
@@ -91,6 +119,36 @@ def test_plane_strain_mixed():
     assert DW[0].shape == (2, 2, 2, 2, 8, 1000)
 
 
+def test_plane_strain_mixed_3d():
+    # data
+    FF, pp, JJ = pre_mixed()
+
+    # embed the plane strain deformation gradients
+    FF3 = np.zeros((3, 3, *FF.shape[2:]))
+    FF3[:2, :2] = FF
+    FF3[2, 2] = 1
+
+    W_up = TwoFieldVariationPlaneStrain(
+        MaterialHyperelasticPlaneStrain(fun=neo_hooke, C10=0.5, bulk=50.0)
+    )
+    W_up3 = TwoFieldVariation(MaterialHyperelastic(fun=neo_hooke, C10=0.5, bulk=50.0))
+
+    W0 = W_up.function([FF, pp])
+    dW = W_up.gradient([FF, pp])
+    DW = W_up.hessian([FF, pp])
+
+    W03 = W_up3.function([FF3, pp])
+    dW3 = W_up3.gradient([FF3, pp])
+    DW3 = W_up3.hessian([FF3, pp])
+
+    assert np.allclose(W0[0], W03[0])
+    assert np.allclose(dW[0], dW3[0][:2, :2])
+    assert np.allclose(dW[1], dW3[1])
+    assert np.allclose(DW[0], DW3[0][:2, :2, :2, :2])
+    assert np.allclose(DW[1], DW3[1][:2, :2])
+    assert np.allclose(DW[2], DW3[2])
+
+
 def test_plane_stress_incompr():
     # data
     FF = pre()
@@ -140,6 +198,8 @@ def test_plane_stress_linear():
 
 if __name__ == "__main__":
     test_plane_strain()
+    test_plane_strain_3d()
     test_plane_strain_mixed()
+    test_plane_strain_mixed_3d()
     test_plane_stress_incompr()
     test_plane_stress_linear()
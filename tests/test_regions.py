@@ -0,0 +1,76 @@
+import numpy as np
+
+from matadi import MaterialHyperelastic, MaterialRegions, Stats
+from matadi.models import mooney_rivlin, neo_hooke
+
+
+def test_regions():
+    # data
+    FF = np.random.rand(3, 3, 8, 100) / 10
+    for a in range(3):
+        FF[a, a] += 1
+
+    FF = np.asfortranarray(FF)
+
+    nh = MaterialHyperelastic(neo_hooke, C10=0.5, bulk=50.0)
+    mr = MaterialHyperelastic(mooney_rivlin, C10=0.3, C01=0.2, bulk=50.0)
+
+    # one region per cell (views) and one region per point (gathered)
+    cells = np.repeat([0, 1, 0, 1], 25)
+
+    for regions in [np.tile(cells, (8, 1)), np.random.randint(0, 2, (8, 100))]:
+        M = MaterialRegions([nh, mr], regions, workers=2)
+
+        for method in ["function", "gradient", "hessian"]:
+            res = getattr(M, method)([FF])
+            res_nh = getattr(nh, method)([FF])
+            res_mr = getattr(mr, method)([FF])
+
+            assert len(res) == len(res_nh)
+
+            for r, a, b in zip(res, res_nh, res_mr):
+                if r is None:
+                    assert a is None
+                else:
+                    assert np.allclose(r, np.where(regions == 0, a, b))
+
+    # shared output array
+    M = MaterialRegions([nh, mr], np.tile(cells, (8, 1)))
+    A = np.zeros((3, 3, 3, 3, 8, 100), order="F")
+
+    assert M.hessian([FF], out=[A])[0] is A
+    assert np.allclose(A, M.hessian([FF])[0])
+
+    # the shapes of the output blocks are probed only once
+    events = []
+    nh.W.stats = Stats(callback=events.append)
+
+    M = MaterialRegions([nh, mr], np.tile(cells, (8, 1)), workers=2)
+    M.hessian([FF], threads=4)
+    M.hessian([FF], threads=4)
+    assert sum(e["points"] == 1 for e in events) == 1
+
+    # structural nonzeros of the output blocks
+    res = M.hessian([FF], nonzeros=True)
+    res_nh = nh.hessian([FF], nonzeros=True)
+    assert np.allclose(res[0][..., cells == 0], res_nh[0][..., cells == 0])
+
+    # per-point values of symbolic parameters
+    C10 = np.asfortranarray(0.5 + np.random.rand(8, 100))
+    nh = MaterialHyperelastic(neo_hooke, C10=0.5, bulk=50.0, parameters=["C10"])
+    mr = MaterialHyperelastic(
+        mooney_rivlin, C10=0.3, C01=0.2, bulk=50.0, parameters=["C10"]
+    )
+
+    for regions in [np.tile(cells, (8, 1)), np.random.randint(0, 2, (8, 100))]:
+        M = MaterialRegions([nh, mr], regions, workers=2)
+
+        for parameters in [{"C10": 1.0}, {"C10": C10}]:
+            P = M.gradient([FF], parameters=parameters)[0]
+            a = nh.gradient([FF], parameters=parameters)[0]
+            b = mr.gradient([FF], parameters=parameters)[0]
+            assert np.allclose(P, np.where(regions == 0, a, b))
+
+
+if __name__ == "__main__":
+    test_regions()
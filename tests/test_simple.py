@@ -1,6 +1,26 @@
-import numpy as np
+import json
+import os
+import shutil
+import tracemalloc
+import warnings
+from time import perf_counter
 
-from matadi import Material, MaterialTensor, Variable
+import numpy as np
+import pytest
+
+from matadi import (
+    Autotuner,
+    CopyWarning,
+    Material,
+    MaterialTensor,
+    PackedSymmetric,
+    Stats,
+    Variable,
+    arena,
+    autotuner,
+    get_memory_budget,
+    set_memory_budget,
+)
 from matadi.math import ddot, det, dev, invariants, sqrt, trace, transpose
 
 
@@ -142,6 +162,602 @@ def test_tensor():
     assert len(A) == 3
 
 
+def test_cache():
+    # variables
+    F = Variable("F", 3, 3)
+
+    # data
+    FF = np.random.rand(3, 3, 8, 100)
+    for a in range(3):
+        FF[a, a] += 1
+
+    # init Material
+    W = Material(x=[F], fun=neohooke, kwargs={"mu": 1.0, "bulk": 10.0})
+
+    DW = W.hessian([FF], threads=1)
+    for threads in [1, 2, 1]:
+        assert np.allclose(W.hessian([FF], threads=threads)[0], DW[0])
+
+    info = W.cache_info()["h"]
+
+    assert info.hits == 2
+    assert info.misses == 2
+    assert info.currsize == 2
+
+    # least-recently-used mapped functions are evicted
+    for n in range(1, info.maxsize + 2):
+        W.hessian([FF[..., :n]], threads=1)
+
+    assert W.cache_info()["h"].currsize == info.maxsize
+
+
+def test_lazy():
+    # variables
+    F = Variable("F", 3, 3)
+
+    # data
+    FF = np.random.rand(3, 3, 8, 100)
+    for a in range(3):
+        FF[a, a] += 1
+
+    # derivatives are generated on first access
+    W = Material(x=[F], fun=neohooke, kwargs={"mu": 1.0, "bulk": 10.0})
+    assert "_hessian" not in W.__dict__
+    assert list(W.cache_info()) == ["f"]
+
+    DW = W.hessian([FF])
+    assert "_hessian" in W.__dict__
+    assert "_gradient" not in W.__dict__
+
+    # pre-warm selected derivatives
+    V = Material(
+        x=[F], fun=neohooke, kwargs={"mu": 1.0, "bulk": 10.0}, prewarm=["hessian"]
+    )
+    assert "_hessian" in V.__dict__
+    assert np.allclose(V.hessian([FF])[0], DW[0])
+
+    V = Material(x=[F], fun=neohooke, kwargs={"mu": 1.0, "bulk": 10.0}, prewarm=True)
+    assert list(V.cache_info()) == ["f", "g", "h", "gvp", "hvp"]
+
+    with pytest.raises(AttributeError):
+        V._undefined
+
+
+def test_evaluate():
+    # variables
+    F = Variable("F", 3, 3)
+
+    # data
+    FF = np.random.rand(3, 3, 8, 100)
+    VV = np.random.rand(3, 3, 8, 100)
+    for a in range(3):
+        FF[a, a] += 1
+
+    # init Material
+    W = Material(x=[F], fun=neohooke, kwargs={"mu": 1.0, "bulk": 10.0})
+
+    # all outputs of one combined function
+    f, g, h = W.evaluate([FF])
+    assert list(W.cache_info()) == ["f", "f_g_h"]
+
+    assert np.allclose(f[0], W.function([FF])[0])
+    assert np.allclose(g[0], W.gradient([FF])[0])
+    assert np.allclose(h[0], W.hessian([FF])[0])
+
+    # vector-products and preallocated outputs
+    out = np.zeros((3, 3, 8, 100), order="F")
+    g, gvp = W.evaluate(
+        [FF], outputs=["gradient", "gradient_vector_product"], v=[VV], out=[[out]]
+    )
+    assert g[0] is out
+    assert np.allclose(gvp[0], W.gradient_vector_product([FF], [VV])[0])
+
+    with pytest.raises(ValueError):
+        W.evaluate([FF], outputs=["stress"])
+
+
+def test_packed():
+    # variables
+    F = Variable("F", 3, 3)
+    p = Variable("p", 1, 1)
+
+    # data
+    FF = np.random.rand(3, 3, 8, 100)
+    pp = np.random.rand(8, 100)
+    for a in range(3):
+        FF[a, a] += 1
+
+    def fun(x):
+        return neohooke(x[:1]) + x[1] * det(x[0]) + x[1] ** 2
+
+    W = Material(x=[F, p], fun=fun)
+    V = Material(x=[F, p], fun=fun, packed=True)
+
+    DW = W.hessian([FF, pp])
+    DV = V.hessian([FF, pp])
+
+    # only the independent entries of the diagonal blocks are stored
+    assert DV[0].shape == (45, 8, 100)
+    assert DV[1].shape == DW[1].shape
+    assert DV[2].shape == DW[2].shape
+
+    A = V.unpack(DV)
+    assert isinstance(A[0], PackedSymmetric)
+    assert A[0].shape == DW[0].shape
+
+    for a, b in zip(A, DW):
+        assert np.allclose(a, b)
+
+    assert np.allclose(A[0][0, 1], DW[0][0, 1])
+    assert np.allclose(A[0][:, 2, 1, 0, 5], DW[0][:, 2, 1, 0, 5])
+    assert np.allclose(A[0][..., 3], DW[0][..., 3])
+
+    # fused evaluation
+    assert np.allclose(V.evaluate([FF, pp], outputs=["hessian"])[0][0], DV[0])
+
+
+def test_nonzeros():
+    # variables
+    F = Variable("F", 3, 3)
+    p = Variable("p", 1, 1)
+
+    # data
+    FF = np.random.rand(3, 3, 8, 100)
+    pp = np.random.rand(8, 100)
+    for a in range(3):
+        FF[a, a] += 1
+
+    fun = lambda x: [x[0] * x[1], x[1]]  # noqa: E731
+    W = MaterialTensor(x=[F, p], fun=fun, triu=False)
+
+    # only the structural nonzeros
+    DW = W.hessian([FF, pp])
+    NZ = W.hessian([FF, pp], nonzeros=True)
+    index = W.sparsity("hessian")
+
+    assert [A.shape[0] for A in NZ] == [9, 0, 9, 1]
+
+    for dense, nonzeros, idx in zip(DW, NZ, index):
+        A = np.zeros_like(dense)
+        A[idx] = nonzeros
+        assert np.allclose(A, dense)
+
+    # scalar-valued material
+    V = Material(x=[F], fun=neohooke)
+    assert np.allclose(
+        V.hessian([FF], nonzeros=True)[0],
+        V.hessian([FF])[0].reshape(81, 8, 100, order="F"),
+    )
+    assert len(V.sparsity("hessian")[0][0]) == 81
+
+
+def test_block():
+    # variables
+    F = Variable("F", 3, 3)
+    p = Variable("p", 1, 1)
+
+    # data
+    FF = np.random.rand(3, 3, 8, 100)
+    pp = np.random.rand(8, 100)
+    for a in range(3):
+        FF[a, a] += 1
+
+    # k = 4 pairs of directions
+    VV = np.random.rand(3, 3, 4, 8, 100)
+    UU = np.random.rand(3, 3, 4, 8, 100)
+    vv = np.random.rand(1, 1, 4, 8, 100)
+    uu = np.random.rand(1, 1, 4, 8, 100)
+
+    def fun(x):
+        return neohooke(x[:1]) + x[1] * det(x[0]) + x[1] ** 2
+
+    W = Material(x=[F, p], fun=fun)
+
+    hvp = W.hessian_vector_product_block([FF, pp], [VV, vv], [UU, uu])
+    assert [h.shape for h in hvp] == [(1, 1, 4, 8, 100)] * 3
+
+    for b in range(4):
+        res = W.hessian_vector_product(
+            [FF, pp], [VV[:, :, b], vv[:, :, b]], [UU[:, :, b], uu[:, :, b]]
+        )
+
+        for h, r in zip(hvp, res):
+            assert np.allclose(h[:, :, b], r)
+
+    assert "hvp4" in W.cache_info()
+
+
+def test_autotune(tmp_path):
+    # variables
+    F = Variable("F", 3, 3)
+
+    # data
+    FF = np.random.rand(3, 3, 8, 100)
+    for a in range(3):
+        FF[a, a] += 1
+
+    # init Material
+    W = Material(x=[F], fun=neohooke, kwargs={"mu": 1.0, "bulk": 10.0})
+    DW = W.hessian([FF], threads=1)
+
+    # all candidates are timed on the first evaluation
+    autotuner.clear()
+    assert np.allclose(W.hessian([FF], threads="auto")[0], DW[0])
+    assert len(autotuner.table) == 1
+
+    (function, points), (threads, chunksize, seconds) = [*autotuner.table.items()][0]
+    assert function.startswith("h_")
+    assert points == (512, 1023)
+    assert (threads, chunksize) in autotuner.candidates(800)
+
+    # the tuned candidate is reused
+    assert np.allclose(W.hessian([FF[..., :70]], threads="auto")[0], DW[0][..., :70])
+    assert len(autotuner.table) == 1
+
+    # the phases of the fastest candidate and the time of the tuning are recorded
+    chunksizes = autotuner.chunksizes
+    autotuner.chunksizes = [None, 200, 400]
+    autotuner.clear()
+    W.stats = Stats()
+
+    start = perf_counter()
+    W.hessian([FF[..., :90]], threads="auto")
+    wall = perf_counter() - start
+
+    s = W.stats["hessian"]
+    seconds = [*autotuner.table.values()][-1][2]
+    assert s.calls == 1
+    assert s.evaluate <= seconds < s.time <= wall
+    assert 0 < s.tune < s.time
+    assert np.isclose(s.time, s.tune + s.map + s.evaluate + s.reshape)
+    autotuner.chunksizes = chunksizes
+
+    # persistent table
+    autotuner.save(tmp_path / "autotune.json")
+
+    tuner = Autotuner()
+    tuner.load(tmp_path / "autotune.json")
+    assert tuner.table == autotuner.table
+
+
+def test_stats(tmp_path):
+    # variables
+    F = Variable("F", 3, 3)
+
+    # data
+    FF = np.random.rand(3, 3, 8, 100)
+    for a in range(3):
+        FF[a, a] += 1
+
+    # init Material
+    W = Material(x=[F], fun=neohooke, kwargs={"mu": 1.0, "bulk": 10.0})
+
+    events = []
+    W.stats = Stats(callback=events.append, trace=True)
+    arena.clear()
+
+    # the pooled output array of the first (dropped) result is reused
+    W.hessian([FF])
+    W.hessian([FF], chunksize=100)
+    W.gradient([FF[..., 0]])
+
+    s = W.stats["hessian"]
+    assert s.calls == 2
+    assert s.points == 1600
+    assert s.bytes == 81 * 800 * 8
+    assert s.time >= s.map + s.evaluate
+    assert np.isclose(s.time, s.map + s.evaluate + s.reshape)
+
+    assert W.stats["gradient"].points == 8
+    assert W.stats["function"].calls == 0
+    assert len(events) == 3
+    assert "hessian" in repr(W.stats)
+
+    # chrome trace
+    W.stats.export_trace(tmp_path / "trace.json")
+
+    with open(tmp_path / "trace.json") as f:
+        trace = json.load(f)
+
+    assert len(trace["traceEvents"]) == 4 * 3
+
+    W.stats.reset()
+    assert W.stats["hessian"].calls == 0
+
+
+def test_parameters():
+    # variables
+    F = Variable("F", 3, 3)
+
+    # data
+    FF = np.random.rand(3, 3, 8, 100)
+    for a in range(3):
+        FF[a, a] += 1
+
+    mu = 1 + np.random.rand(8, 100)
+
+    # parameters as symbolic inputs
+    W = Material(
+        x=[F], fun=neohooke, kwargs={"mu": 1.0, "bulk": 10.0}, parameters=["mu"]
+    )
+    V = Material(x=[F], fun=neohooke, kwargs={"mu": 2.0, "bulk": 10.0})
+
+    # default values and scalar values
+    assert np.allclose(
+        W.hessian([FF])[0],
+        Material(x=[F], fun=neohooke, kwargs={"mu": 1.0, "bulk": 10.0}).hessian([FF])[
+            0
+        ],
+    )
+    assert np.allclose(W.hessian([FF], parameters={"mu": 2.0})[0], V.hessian([FF])[0])
+
+    # per-point values
+    P = W.gradient([FF], parameters={"mu": mu})[0]
+
+    for a, b in [(0, 0), (3, 7), (7, 99)]:
+        U = Material(x=[F], fun=neohooke, kwargs={"mu": mu[a, b], "bulk": 10.0})
+        assert np.allclose(P[..., a, b], U.gradient([FF[..., a, b]])[0])
+
+    f, g = W.evaluate([FF], outputs=["function", "gradient"], parameters={"mu": mu})
+    assert np.allclose(g[0], P)
+
+    # sensitivities w.r.t. the parameters
+    dWdmu, dPdmu = W.sensitivity([FF], parameters={"mu": mu})
+    assert dWdmu.shape == (1, 1, 1, 1, 8, 100)
+    assert dPdmu.shape == (3, 3, 1, 1, 8, 100)
+
+    # finite differences
+    h = 1e-6
+    g2 = W.evaluate([FF], outputs=["function", "gradient"], parameters={"mu": mu + h})
+
+    assert np.allclose(dWdmu[0, 0, 0, 0], (g2[0][0] - f[0])[0, 0] / h, atol=1e-4)
+    assert np.allclose(dPdmu[:, :, 0, 0], (g2[1][0] - P) / h, atol=1e-4)
+
+    # scalar values on a single point
+    P = W.gradient([FF[..., :1, :1]], parameters={"mu": 2.0})[0]
+    assert np.allclose(P, V.gradient([FF[..., :1, :1]])[0])
+
+    with pytest.raises(ValueError):
+        W.gradient([FF], parameters={"bulk": 5.0})
+
+    with pytest.raises(ValueError):
+        W.gradient([FF], parameters={"mu": mu.ravel()})
+
+
+def test_out():
+    # variables
+    F = Variable("F", 3, 3)
+
+    # data
+    FF = np.random.rand(3, 3, 8, 100)
+    for a in range(3):
+        FF[a, a] += 1
+
+    # init Material
+    W = Material(x=[F], fun=neohooke, kwargs={"mu": 1.0, "bulk": 10.0})
+
+    # results of pooled output arrays are not overwritten while referenced
+    dW = W.gradient([FF])
+    dW2 = W.gradient([2 * FF])
+    assert not np.shares_memory(dW[0], dW2[0])
+    assert np.allclose(dW[0], W.gradient([FF])[0])
+
+    # Fortran- and C-contiguous output arrays
+    for order in ["F", "C"]:
+        P = np.zeros((3, 3, 8, 100), order=order)
+        A = np.zeros((3, 3, 3, 3, 8, 100), order=order)
+
+        res = W.gradient([FF], out=[P])
+        assert res[0] is P
+        assert np.allclose(P, dW[0])
+
+        res = W.hessian([FF], out=[A])
+        assert res[0] is A
+        assert np.allclose(A, W.hessian([FF])[0])
+
+    with pytest.raises(ValueError):
+        W.gradient([FF], out=[np.zeros((3, 3, 8))])
+
+    # the pool of output arrays is capped, may be cleared and disabled
+    assert 0 < arena.nbytes <= arena.maxbytes
+    arena.clear()
+    assert arena.nbytes == 0
+
+    maxbytes = arena.maxbytes
+    arena.maxbytes = 0
+    W.hessian([FF])
+    assert arena.nbytes == 0
+    arena.maxbytes = maxbytes
+
+    # outputs with structural zeros
+    W = MaterialTensor(x=[F], fun=lambda x: x[0])
+    A = np.ones((3, 3, 3, 3, 8, 100), order="F")
+
+    W.hessian([FF], out=[A])
+    assert np.allclose(A[..., 0, 0], np.einsum("ik,jl->ijkl", np.eye(3), np.eye(3)))
+
+
+def test_copy():
+    # variables
+    F = Variable("F", 3, 3)
+
+    # data
+    FF = np.random.rand(3, 3, 8, 100)
+    for a in range(3):
+        FF[a, a] += 1
+
+    # init Material
+    W = Material(x=[F], fun=neohooke, kwargs={"mu": 1.0, "bulk": 10.0})
+
+    # Fortran-contiguous inputs are not copied
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", CopyWarning)
+        P = W.gradient([np.asfortranarray(FF)])[0]
+        P = W.gradient([np.asfortranarray(FF)[..., :50]])[0]
+
+    # C-contiguous inputs are copied
+    with pytest.warns(CopyWarning):
+        P = W.gradient([FF])[0]
+
+    assert np.allclose(P, W.gradient([np.asfortranarray(FF)])[0])
+
+
+def test_chunks():
+    # variables
+    F = Variable("F", 3, 3)
+
+    # data
+    FF = np.random.rand(3, 3, 8, 100)
+    for a in range(3):
+        FF[a, a] += 1
+
+    # init Material
+    W = Material(x=[F], fun=neohooke, kwargs={"mu": 1.0, "bulk": 10.0})
+
+    DW = W.hessian([FF], chunksize=10**6)
+    A = np.zeros((3, 3, 3, 3, 8, 100))
+
+    for chunksize in [1, 8, 30, 799]:
+        assert np.allclose(W.hessian([FF], chunksize=chunksize)[0], DW[0])
+        assert np.allclose(W.hessian([FF], chunksize=chunksize, out=[A])[0], DW[0])
+
+    # chunks by a global memory budget
+    budget = get_memory_budget()
+    set_memory_budget(50 * 8 * (9 + 81))
+
+    W = Material(x=[F], fun=neohooke, kwargs={"mu": 1.0, "bulk": 10.0})
+
+    # chunks of 6 and 4 items of the last axis (48 and 32 points)
+    assert np.allclose(W.hessian([FF])[0], DW[0])
+    assert W.cache_info()["h"].currsize == 2
+
+    set_memory_budget(budget)
+
+
+def test_chunks_memory():
+    # variables
+    F = Variable("F", 3, 3)
+
+    # data
+    FF = np.asfortranarray(np.random.rand(3, 3, 8, 1000))
+    A = np.zeros((3, 3, 3, 3, 8, 1000), order="F")
+
+    # outputs with structural zeros
+    W = MaterialTensor(x=[F], fun=lambda x: x[0])
+
+    budget = get_memory_budget()
+    set_memory_budget(800 * 8 * (9 + 81))
+    W.hessian([FF], out=[A])
+
+    # the outputs are scattered in-place within the memory budget
+    tracemalloc.start()
+    W.hessian([FF], out=[A])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    set_memory_budget(budget)
+
+    assert peak < 800 * 8 * (9 + 81)
+    assert np.allclose(A[..., 0, 0], np.einsum("ik,jl->ijkl", np.eye(3), np.eye(3)))
+
+
+def test_disk_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("MATADI_CACHE_DIR", str(tmp_path))
+
+    # variables
+    F = Variable("F", 3, 3)
+    p = Variable("p", 1, 1)
+
+    # data
+    FF = np.random.rand(3, 3, 8, 100)
+    pp = np.random.rand(8, 100)
+    for a in range(3):
+        FF[a, a] += 1
+
+    W = Material(x=[F], fun=neohooke, kwargs={"mu": 1.0, "bulk": 10.0}, cache=True)
+    assert len(os.listdir(tmp_path)) == 0
+
+    # derivatives are stored on first access
+    W.hessian([FF])
+    assert len(os.listdir(tmp_path)) == 1
+
+    # derivatives are loaded from the cache
+    V = Material(x=[F], fun=neohooke, kwargs={"mu": 1.0, "bulk": 10.0}, cache=True)
+    monkeypatch.setattr(V, "_generate", None)
+    assert np.allclose(V.hessian([FF])[0], W.hessian([FF])[0])
+
+    # different parameters are stored under different keys
+    V = Material(
+        x=[F], fun=neohooke, kwargs={"mu": 2.0, "bulk": 10.0}, cache=True, prewarm=True
+    )
+    assert len(os.listdir(tmp_path)) == 5
+
+    # tensor-based material
+    fun = lambda x: [x[0] * x[1], x[1]]  # noqa: E731
+    W = MaterialTensor(x=[F, p], fun=fun, cache=True, prewarm=["hessian"])
+    V = MaterialTensor(x=[F, p], fun=fun, cache=True)
+    monkeypatch.setattr(V, "_generate", None)
+
+    for a, b in zip(V.hessian([FF, pp]), W.hessian([FF, pp])):
+        assert np.allclose(a, b)
+
+
+@pytest.mark.skipif(shutil.which(os.environ.get("CC", "cc")) is None, reason="no cc")
+def test_compiled(tmp_path, monkeypatch):
+    monkeypatch.setenv("MATADI_CACHE_DIR", str(tmp_path))
+
+    # variables
+    F = Variable("F", 3, 3)
+    p = Variable("p", 1, 1)
+
+    # data
+    FF = np.random.rand(3, 3, 8, 100)
+    pp = np.random.rand(8, 100)
+    for a in range(3):
+        FF[a, a] += 1
+
+    kwargs = {"mu": 1.0, "bulk": 10.0}
+
+    W = Material(x=[F], fun=neohooke, kwargs=kwargs)
+    V = Material(x=[F], fun=neohooke, kwargs=kwargs, compiled=True)
+    assert len(os.listdir(tmp_path)) == 1
+
+    V = Material(x=[F], fun=neohooke, kwargs=kwargs, compiled=True, prewarm=True)
+    assert len(os.listdir(tmp_path)) == 5
+
+    for method in ["function", "gradient", "hessian"]:
+        assert np.allclose(
+            getattr(V, method)([FF], threads=2)[0], getattr(W, method)([FF])[0]
+        )
+
+    assert np.allclose(
+        V.hessian_vector_product([FF], [FF], [FF])[0],
+        W.hessian_vector_product([FF], [FF], [FF])[0],
+    )
+
+    # compiled libraries are loaded from the cache
+    V = Material(x=[F], fun=neohooke, kwargs=kwargs, compiled=True)
+    assert len(os.listdir(tmp_path)) == 5
+
+    # compiled tensor-based material
+    fun = lambda x: [x[0] * x[1], x[1]]  # noqa: E731
+    W = MaterialTensor(x=[F, p], fun=fun)
+    V = MaterialTensor(x=[F, p], fun=fun, compiled=True)
+
+    for a, b in zip(V.hessian([FF, pp]), W.hessian([FF, pp])):
+        assert np.allclose(a, b)
+
+
 if __name__ == "__main__":
     test_simple()
     test_tensor()
+    test_cache()
+    test_lazy()
+    test_evaluate()
+    test_packed()
+    test_nonzeros()
+    test_block()
+    test_parameters()
+    test_out()
+    test_copy()
+    test_chunks()